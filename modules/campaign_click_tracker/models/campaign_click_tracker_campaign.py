@@ -6,7 +6,7 @@
 
 from odoo import models, fields, api
 from odoo.tools.translate import _
-from odoo.osv.expression import FALSE_DOMAIN
+from odoo.exceptions import UserError
 from odoo.tools import safe_eval
 
 from logging import getLogger
@@ -16,6 +16,17 @@ from uuid import uuid4
 _logger = getLogger(__name__)
 
 
+COUNT_OPERATORS = {
+    '=': '= %s',
+    '!=': '<> %s',
+    '<>': '<> %s',
+    '<': '< %s',
+    '<=': '<= %s',
+    '>': '> %s',
+    '>=': '>= %s'
+}
+
+
 class CampaignClickTrackerCampaign(models.Model):
     """
     Defines a campaign with its description, available answers,
@@ -95,33 +106,21 @@ class CampaignClickTrackerCampaign(models.Model):
 
     @api.model
     def _search_available_answer_count(self, operator, value):
-
-        if isinstance(value, bool) or value is None:
-            if operator == '=':
-                operator = '>' if value else '<='
-            else:
-                operator = '>' if not value else '<='
-            value = 0
-
-        sql = '''
-            SELECT 
-                campaign_id
-            FROM
-                campaign_click_tracker_answer AS ta
-            WHERE active IS TRUE
-            GROUP BY campaign_id
-            HAVING count("id") {operator} {value}
-        '''.format(operator=operator, value=value)
-
-        cursor = self.env.cr
-        cursor.execute(sql)
-        results = cursor.dictfetchall()
-
-        if results:
-            campaign_ids = [item['campaign_id'] for item in results]
-            return [('id', 'in', campaign_ids)]
-
-        return FALSE_DOMAIN
+        return self._search_by_count(
+            self._search_available_answer_count_sql, operator, value)
+
+    _search_available_answer_count_sql = '''
+        SELECT
+            ctc."id"
+        FROM
+            campaign_click_tracker_campaign AS ctc
+            LEFT JOIN campaign_click_tracker_answer AS ta
+                ON ta.campaign_id = ctc."id" AND ta.active IS TRUE
+        GROUP BY
+            ctc."id"
+        HAVING
+            COUNT ( ta."id" ) {comparison}
+    '''
 
     user_input_ids = fields.One2many(
         string='User inputs',
@@ -156,6 +155,36 @@ class CampaignClickTrackerCampaign(models.Model):
 
     @api.model
     def _search_user_input_count(self, operator, value):
+        return self._search_by_count(
+            self._search_user_input_count_sql, operator, value)
+
+    _search_user_input_count_sql = '''
+        SELECT
+            ctc."id"
+        FROM
+            campaign_click_tracker_campaign AS ctc
+            LEFT JOIN campaign_click_tracker_user_input AS ui
+                ON ui.campaign_id = ctc."id" AND ui.active IS TRUE
+        GROUP BY
+            ctc."id"
+        HAVING
+            COUNT ( ui."id" ) {comparison}
+    '''
+
+    @api.model
+    def _search_by_count(self, sql, operator, value):
+        """ Build a subquery domain to search campaigns by a count. The
+        operator must be in the whitelist and the value is passed as a bound
+        parameter.
+
+        Args:
+            sql (str): query with a ``{comparison}`` placeholder
+            operator (str): domain leaf operator
+            value (int|bool): domain leaf value, False means zero
+
+        Returns:
+            list: domain like ``[('id', 'inselect', (sql, params))]``
+        """
 
         if isinstance(value, bool) or value is None:
             if operator == '=':
@@ -164,25 +193,13 @@ class CampaignClickTrackerCampaign(models.Model):
                 operator = '>' if not value else '<='
             value = 0
 
-        sql = '''
-            SELECT 
-                campaign_id
-            FROM
-                campaign_click_tracker_user_input AS ui
-            WHERE active IS TRUE
-            GROUP BY campaign_id
-            HAVING count("id") {operator} {value}
-        '''.format(operator=operator, value=value)
-
-        cursor = self.env.cr
-        cursor.execute(sql)
-        results = cursor.dictfetchall()
-
-        if results:
-            campaign_ids = [item['campaign_id'] for item in results]
-            return [('id', 'in', campaign_ids)]
-
-        return FALSE_DOMAIN
+        comparison = COUNT_OPERATORS.get(operator)
+        if not comparison:
+            raise UserError(_('Operator not implemented: %s') % operator)
+
+        sql = sql.format(comparison=comparison)
+
+        return [('id', 'inselect', (sql, [value]))]
 
     partner_count = fields.Integer(
         string='Partner count',
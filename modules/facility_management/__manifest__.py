@@ -19,6 +19,7 @@
         'base',
         'record_ownership',
         'base_field_m2m_view',
+        'materialized_views',
         'mail'
     ],
 
@@ -42,6 +43,9 @@
         'security/facility_weekday.xml',
         'security/facility_reservation_scheduler.xml',
         'security/facility_complex_reservation_rel.xml',
+        'security/facility_occupancy_report.xml',
+        'security/facility_reservation_timeline.xml',
+        'security/facility_reservation_job.xml',
 
         'views/facility_weekday_view.xml',
         'views/facility_complex_view.xml',
@@ -50,12 +54,15 @@
         'views/facility_reservation_view.xml',
         'views/facility_reservation_scheduler_view.xml',
         'views/res_config_settings_view.xml',
+        'views/facility_reservation_timeline_view.xml',
+        'views/facility_reservation_job_view.xml',
 
         'wizard/facility_search_available_wizard_view.xml',
         'wizard/facility_reporting_wizard_view.xml',
         'wizard/facility_reservation_massive_actions_wizard_view.xml',
 
-        'report/facility_report.xml'
+        'report/facility_report.xml',
+        'report/facility_occupancy_report_view.xml'
     ],
 
     'demo': [
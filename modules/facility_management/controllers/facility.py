@@ -4,10 +4,16 @@
 #    __openerp__.py file at the root folder of this module.                   #
 ###############################################################################
 
+from odoo import fields
 from odoo.http import Controller, route
 from odoo.http import request
+from odoo.addons.facility_management.utils.timetable_cache import \
+    timetable_cache, week_start
 
 from logging import getLogger
+from datetime import timedelta
+from hashlib import sha1
+from werkzeug.http import http_date
 
 
 _logger = getLogger(__name__)
@@ -16,18 +22,177 @@ _logger = getLogger(__name__)
 REPORT = ('report.facility_management.'
           'view_facility_qweb')
 
+TEMPLATE = 'facility_management.view_facility_qweb'
+
 
 class Facility(Controller):
     """ Allow to publish facility timetables
     """
 
     @route('/facility/timetable', type='http', auth='none', website="True")
-    def facility_timetable(self, **kw):
+    def facility_timetable(self, week=None, complex=None, facility=None,
+                           **kw):
+        """ Weekly timetable of the facilities. Rendered pages are cached and
+        validated against the reservations shown in them.
+
+        Args:
+            week (str, optional): any date (YYYY-MM-DD) of the week to show,
+                current week will be shown by default
+            complex (str, optional): comma separated complex ids
+            facility (str, optional): comma separated facility ids
+        """
+
+        date_start = week_start(self._parse_week(week))
+        date_stop = date_start + timedelta(days=6)
+
         facility_obj = request.env['facility.facility'].sudo()
-        facility_set = facility_obj.search([])
+        domain = self._build_facility_domain(complex, facility)
+        facility_set = facility_obj.search(domain)
+
+        lang = request.env.context.get('lang') or 'en_US'
+        dbname = request.env.cr.dbname
+
+        key = timetable_cache.key(dbname, date_start, facility_set.ids, lang)
+        signature = self._compute_signature(facility_set, date_start)
+
+        etag = sha1(repr((key, signature)).encode('utf-8')).hexdigest()
+        last_modified = max(filter(None, signature[1:]), default=None)
+
+        if self._not_modified(etag, last_modified):
+            response = request.make_response('')
+            response.status_code = 304
+            return self._set_cache_headers(response, etag, last_modified)
+
+        body = timetable_cache.get(key, signature)
+        if body is None:
+            report_obj = request.env[REPORT].sudo()
+
+            data = {
+                'interval': {
+                    'date_start': date_start,
+                    'date_stop': date_stop
+                },
+                'full_weeks': True
+            }
+            values = report_obj._get_report_values(facility_set.ids, data)
+
+            view_obj = request.env['ir.ui.view'].sudo()
+            body = view_obj.render_template(TEMPLATE, values)
+
+            timetable_cache.set(key, signature, body)
+
+        headers = [('Content-Type', 'text/html; charset=utf-8')]
+        response = request.make_response(body, headers=headers)
+
+        return self._set_cache_headers(response, etag, last_modified)
+
+    @staticmethod
+    def _parse_week(week):
+        try:
+            value = fields.Date.to_date(week)
+        except (TypeError, ValueError):
+            value = None
+
+        return value or fields.Date.today()
+
+    @staticmethod
+    def _parse_ids(value):
+        result = []
+
+        for item in (value or '').split(','):
+            item = item.strip()
+            if item.isdigit():
+                result.append(int(item))
+
+        return result
+
+    def _build_facility_domain(self, complex_ids=None, facility_ids=None):
+        domain = []
+
+        complex_ids = self._parse_ids(complex_ids)
+        if complex_ids:
+            domain.append(('complex_id', 'in', complex_ids))
+
+        facility_ids = self._parse_ids(facility_ids)
+        if facility_ids:
+            domain.append(('id', 'in', facility_ids))
+
+        return domain
+
+    def _compute_signature(self, facility_set, date_start):
+        """ Summary of the data shown in a timetable, it changes whenever a
+        reservation is created, changed or removed in the given week. It is
+        read from the reservations, the same source the timetable is
+        rendered from, so it never lags behind the last committed change.
+
+        Returns:
+            tuple: ``(count, last reservation change, last facility change)``
+        """
+
+        if not facility_set:
+            return (0, None, None)
+
+        date_stop = date_start + timedelta(days=7)
+
+        facility_set.flush()
+
+        params = {
+            'facility_ids': facility_set.ids,
+            'date_start': date_start,
+            'date_stop': date_stop
+        }
+        request.env.cr.execute(self._timetable_signature_sql, params)
+
+        return tuple(request.env.cr.fetchone())
+
+    @staticmethod
+    def _not_modified(etag, last_modified):
+        httprequest = request.httprequest
+
+        if httprequest.if_none_match:
+            return httprequest.if_none_match.contains(etag)
+
+        since = httprequest.if_modified_since
+        if since and last_modified:
+            since = since.replace(tzinfo=None)
+            return last_modified.replace(microsecond=0) <= since
+
+        return False
+
+    @staticmethod
+    def _set_cache_headers(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified)
 
-        report_obj = request.env[REPORT].sudo()
+        response.headers['Cache-Control'] = 'public, no-cache'
 
-        values = report_obj._get_report_values(facility_set.mapped('id'))
+        return response
 
-        return request.render('facility_management.view_facility_qweb', values)
+    _timetable_signature_sql = '''
+        SELECT
+            COUNT ( fr."id" ) AS reservation_count,
+            MAX ( fr.write_date ) AS reservation_write_date,
+            (
+                SELECT
+                    MAX ( ff.write_date )
+                FROM
+                    facility_facility AS ff
+                WHERE
+                    ff."id" = ANY ( %(facility_ids)s::INTEGER[] )
+            ) AS facility_write_date
+        FROM
+            facility_reservation AS fr
+        WHERE
+            fr.active
+            AND fr.facility_id = ANY ( %(facility_ids)s::INTEGER[] )
+            AND (
+                (
+                    fr.date_start >= %(date_start)s::TIMESTAMP
+                    AND fr.date_start < %(date_stop)s::TIMESTAMP
+                ) OR (
+                    fr.date_stop >= %(date_start)s::TIMESTAMP
+                    AND fr.date_stop < %(date_stop)s::TIMESTAMP
+                )
+            )
+    '''
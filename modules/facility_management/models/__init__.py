@@ -14,4 +14,6 @@ from . import ir_actions_report
 from . import facility_weekday
 from . import facility_reservation_scheduler
 from . import res_config_settings
-from . import facility_complex_reservation_rel
\ No newline at end of file
+from . import facility_complex_reservation_rel
+from . import facility_reservation_timeline
+from . import facility_reservation_job
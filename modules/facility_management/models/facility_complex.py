@@ -4,17 +4,22 @@
 #    __openerp__.py file at the root folder of this module.                   #
 ###############################################################################
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools, SUPERUSER_ID
 from odoo.tools.translate import _
 from odoo.tools import safe_eval
-from odoo.osv.expression import AND, TRUE_DOMAIN, FALSE_DOMAIN
+from odoo.osv.expression import AND, TRUE_DOMAIN
 from odoo.exceptions import ValidationError
+from odoo.addons.facility_management.utils.timezone_utils import \
+    get_timezone
+from odoo.addons.facility_management.utils.sql_utils import \
+    aggregate_domain
 
 from logging import getLogger
 from math import trunc, pow
 from random import random
 from re import sub
 from datetime import datetime
+from time import perf_counter
 
 
 _logger = getLogger(__name__)
@@ -119,51 +124,20 @@ class FacilityComplex(models.Model):
 
     @api.model
     def _search_facility_count(self, operator, value):
-        domain = FALSE_DOMAIN
-
-        if value is True:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator == '=' else FALSE_DOMAIN
-
-        elif value is False:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator != '=' else FALSE_DOMAIN
-
-        else:
-
-            sql = self._search_facility_count_sql
-
-            self.env.cr.execute(sql.format(operator=operator, value=value))
-            rows = self.env.cr.dictfetchall()
-
-            if not rows:
-                return FALSE_DOMAIN
-
-            facility_ids = [row['complex_id'] for row in (rows or [])]
-
-            domain = [('id', 'in', facility_ids)]
-
-        return domain
+        return aggregate_domain(
+            self._search_facility_count_sql, operator, value)
 
     _search_facility_count_sql = '''
-        WITH active_facilities AS (
-            SELECT
-                "id" AS facility_id,
-                complex_id
-            FROM
-                facility
-            WHERE
-                active
-        )
         SELECT
-            aec."id" AS complex_id
+            fc."id"
         FROM
-            complex AS aec
-            LEFT JOIN active_facilities AS af ON aec."id" = af.complex_id
-        WHERE
-            aec.active
+            facility_complex AS fc
+            LEFT JOIN facility_facility AS ff
+                ON ff.complex_id = fc."id" AND ff.active
         GROUP BY
-            aec."id"
+            fc."id"
         HAVING
-            COUNT ( af.complex_id ) {operator} {value}
+            COUNT ( ff."id" ) {comparison}
     '''
 
     supervisor_ids = fields.Many2many(
@@ -207,13 +181,20 @@ class FacilityComplex(models.Model):
         index=False,
         default=0,
         help='Total number of reservations made for this facility complex',
-        compute='_compute_reservation_count'
+        compute='_compute_reservation_count',
+        store=True
     )
 
-    @api.depends('reservation_ids')
+    @api.depends('facility_ids.active', 'facility_ids.reservation_ids',
+                 'facility_ids.reservation_ids.active')
     def _compute_reservation_count(self):
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'complex_id', self.filtered('id').ids,
+            [('facility_id.active', '=', True)])
+
         for record in self:
-            record.reservation_count = len(record.reservation_ids)
+            record.reservation_count = counts.get(record.id, 0)
 
     unconfirmed_reservation_ids = fields.Many2manyView(
         string='Unconfirmed reservations',
@@ -239,14 +220,21 @@ class FacilityComplex(models.Model):
         default=0,
         help=('Total reservations awaiting confirmation for this facility '
               'complex'),
-        compute='_compute_unconfirmed_reservation_count'
+        compute='_compute_unconfirmed_reservation_count',
+        store=True
     )
 
-    @api.depends('unconfirmed_reservation_ids')
+    @api.depends('facility_ids.active', 'facility_ids.reservation_ids',
+                 'facility_ids.reservation_ids.active',
+                 'facility_ids.reservation_ids.state')
     def _compute_unconfirmed_reservation_count(self):
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'complex_id', self.filtered('id').ids,
+            [('facility_id.active', '=', True), ('state', '=', 'requested')])
+
         for record in self:
-            record.unconfirmed_reservation_count = \
-                len(record.unconfirmed_reservation_ids)
+            record.unconfirmed_reservation_count = counts.get(record.id, 0)
 
     def _build_supervisor_ids_domain(self):
         """
@@ -291,6 +279,9 @@ class FacilityComplex(models.Model):
         is listed as a supervisor, owner, or delegate of a complex while also
         being in the facility monitors group.
 
+        The complexes each user can supervise are memoized by
+        ``_get_supervision_scope``.
+
         Parameters:
             user (res.users|int, optional): User (or user ID) to check.
                 Defaults to the current logged-in user.
@@ -305,11 +296,7 @@ class FacilityComplex(models.Model):
         self.ensure_one()
 
         # Admin and system always are allowed
-        super_users = [
-            self.env.ref('base.user_admin'),
-            self.env.ref('base.user_root')
-        ]
-        if self.env.user in super_users:
+        if self._get_supervision_scope(self.env.uid)[0] is None:
             return True
 
         user_obj = self.env['res.users']
@@ -322,20 +309,165 @@ class FacilityComplex(models.Model):
         if not isinstance(user, type(user_obj)):
             raise ValueError(_('There is no user to check'))
 
-        xmlid = 'facility_management.facility_group_manager'
+        is_manager, complex_ids = self._get_supervision_scope(user.id)
+
+        return bool(is_manager) or self._origin.id in complex_ids
+
+    @api.model
+    def get_supervised_complexes(self, user=None):
+        """ Get all the complexes the given user can supervise, computed in
+        a single query and memoized until supervisors, owners or group
+        membership change.
+
+        Parameters:
+            user (res.users|int, optional): User (or user ID) to check.
+                Defaults to the current logged-in user.
+
+        Returns:
+            models.Model: facility.complex recordset
+        """
+
+        complex_obj = self.with_context(active_test=False)
+
+        # Admin and system always are allowed
+        if self._get_supervision_scope(self.env.uid)[0] is None:
+            return complex_obj.search([])
+
+        if not user:
+            user = self.env.user
+        elif isinstance(user, int):
+            user = self.env['res.users'].browse(user)
+
+        is_manager, complex_ids = self._get_supervision_scope(user.id)
+        if is_manager:
+            return complex_obj.search([])
+
+        return self.browse(sorted(complex_ids))
+
+    @api.model
+    @tools.ormcache('uid')
+    def _get_supervision_scope(self, uid):
+        """ Compute, in a single query, which complexes the given user can
+        supervise.
+
+        Returns:
+            tuple: ``(is_manager, complex_ids)`` where ``is_manager`` is None
+            for the admin and system users, True for the users in the facility
+            managers group and False for the others; ``complex_ids`` is a
+            frozenset with the complexes where the user is supervisor, owner
+            or subrogate while also being in the facility monitors group
+        """
+
         imd_obj = self.env['ir.model.data']
-        group_id = imd_obj.xmlid_to_res_id(xmlid, raise_if_not_found=True)
 
-        # Efficient way to verify user's group without loading all IDs
-        domain = [('id', '=', user.id), ('groups_id', '=', group_id)]
-        if user_obj.search_count(domain) > 0:
-            return True
+        admin_id = imd_obj.xmlid_to_res_id(
+            'base.user_admin', raise_if_not_found=False)
+        if uid in (SUPERUSER_ID, admin_id):
+            return None, frozenset()
+
+        # Pending changes must be written before the result is memoized
+        self.flush(self._supervision_fields)
+        self.env['res.users'].flush(['groups_id'])
+
+        params = {
+            'uid': uid,
+            'manager_gid': imd_obj.xmlid_to_res_id(
+                'facility_management.facility_group_manager',
+                raise_if_not_found=True),
+            'monitor_gid': imd_obj.xmlid_to_res_id(
+                'facility_management.facility_group_monitor',
+                raise_if_not_found=True)
+        }
+
+        self.env.cr.execute(self._get_supervision_scope_sql, params)
+        is_manager, complex_ids = self.env.cr.fetchone()
+
+        return bool(is_manager), frozenset(complex_ids or [])
+
+    _get_supervision_scope_sql = '''
+        WITH user_groups AS (
+            SELECT
+                gid
+            FROM
+                res_groups_users_rel
+            WHERE
+                uid = %(uid)s
+                AND gid IN ( %(manager_gid)s, %(monitor_gid)s )
+        )
+        SELECT
+            EXISTS (
+                SELECT 1 FROM user_groups WHERE gid = %(manager_gid)s
+            ) AS is_manager,
+            ARRAY (
+                SELECT
+                    fc."id"
+                FROM
+                    facility_complex AS fc
+                WHERE
+                    EXISTS (
+                        SELECT 1 FROM user_groups WHERE gid = %(monitor_gid)s
+                    ) AND (
+                        fc.owner_id = %(uid)s
+                        OR fc.subrogate_id = %(uid)s
+                        OR EXISTS (
+                            SELECT
+                                1
+                            FROM
+                                facility_complex_res_users_preferred_supervisor_rel
+                                    AS rel
+                            WHERE
+                                rel.complex_id = fc."id"
+                                AND rel.user_id = %(uid)s
+                        )
+                    )
+            ) AS complex_ids
+    '''
+
+    # Fields read by ``_get_supervision_scope``, memoized scopes have to be
+    # cleared only when some of them change
+    _supervision_fields = ['supervisor_ids', 'owner_id', 'subrogate_id']
+
+    def _has_supervision(self):
+        return any(
+            record[field_name]
+            for record in self for field_name in self._supervision_fields
+        )
+
+    @api.model_create_multi
+    def create(self, values_list):
+        """ Overridden method 'create'
+        """
 
-        allowed_set = self.get_allowed_supervisors()
-        if not allowed_set:
-            return False
+        result = super(FacilityComplex, self).create(values_list)
+
+        if result._has_supervision():
+            self.clear_caches()  # Supervision scopes
+
+        return result
+
+    def write(self, values):
+        """ Overridden method 'write'
+        """
+
+        result = super(FacilityComplex, self).write(values)
+
+        if any(name in values for name in self._supervision_fields):
+            self.clear_caches()  # Supervision scopes
+
+        return result
+
+    def unlink(self):
+        """ Overridden method 'unlink'
+        """
 
-        return user in allowed_set
+        supervised = self._has_supervision()
+
+        result = super(FacilityComplex, self).unlink()
+
+        if supervised:
+            self.clear_caches()  # Supervision scopes
+
+        return result
 
     _sql_constraints = [
         (
@@ -527,16 +659,20 @@ class FacilityComplex(models.Model):
                           given criteria
         """
 
-        self.ensure_one()
-
         reservation_obj = self.env['facility.reservation']
 
         requested_domain = [('state', '=', 'requested')]
 
-        facility_ids = self.mapped('facility_ids.id')
-        facility_domain = [('facility_id', 'in', facility_ids)]
+        # Solved by the partial index of the complex/reservation relation,
+        # which is kept by triggers, so pending changes are written first
+        reservation_obj.flush(['state', 'facility_id', 'active'])
 
-        domains = [facility_domain, requested_domain]
+        params = [self.filtered('id').ids]
+        complex_domain = [
+            ('id', 'inselect', (self._compute_requested_sql, params))
+        ]
+
+        domains = [complex_domain, requested_domain]
 
         if cron_domain:
             domains.append(cron_domain)
@@ -545,12 +681,91 @@ class FacilityComplex(models.Model):
             domains.append(filter_domain)
 
         reservation_domain = AND(domains)
-        reservation_set = reservation_obj.search(reservation_domain)
+        reservation_set = reservation_obj.search(
+            reservation_domain, order='complex_id ASC, date_start ASC')
 
         return reservation_set
 
+    _compute_requested_sql = '''
+        SELECT
+            rel.reservation_id
+        FROM
+            facility_complex_facility_reservation_rel AS rel
+        WHERE
+            rel.complex_id = ANY ( %s::INTEGER[] )
+            AND rel."state" = 'requested'
+    '''
+
+    def _group_requested(self, cron_domain=None, filter_domain=None):
+        """ Retrieve, in a single search, the requested reservations of all
+        the complexes in this recordset, grouped by complex.
+
+        Args:
+            cron_domain (list, optional): domain to filter reservations
+                                          based on the last cron job run time.
+            filter_domain (list, optional): additional filtering constraints
+                                            on the reservations.
+
+        Returns:
+            dict: ``{complex_id: reservation recordset}``, all the recordsets
+            share the same prefetching set
+        """
+
+        reservation_set = self._compute_requested(cron_domain, filter_domain)
+
+        grouped = {}
+        for reservation in reservation_set:
+            complex_id = reservation.complex_id.id
+            grouped.setdefault(complex_id, []).append(reservation.id)
+
+        prefetch_ids = reservation_set._prefetch_ids
+
+        return {
+            complex_id: reservation_set.browse(ids).with_prefetch(prefetch_ids)
+            for complex_id, ids in grouped.items()
+        }
+
+    def _post_bulk_summary(self, reservation_set, changes):
+        """ Post a single note in each complex summarizing the changes made
+        in bulk to its reservations, instead of one tracking message for
+        each reservation.
+
+        Args:
+            reservation_set (models.Model): updated reservations
+            changes (str): description of the written values
+        """
+
+        counts = {}
+        for reservation in reservation_set:
+            complex_id = reservation.complex_id.id
+            counts[complex_id] = counts.get(complex_id, 0) + 1
+
+        author_id = self.env.user.partner_id.id
+        msg = _('{count} reservations have been updated. {changes}')
+
+        for record in self.sudo():
+            body = msg.format(count=counts.get(record.id, 0), changes=changes)
+            record.message_post(
+                body=body, subtype='mail.mt_note', author_id=author_id)
+
+    def get_tz(self):
+        """ Retrieve the complex timezone, in order of priority: the one of
+        the complex partner, the one of the company partner or the one of the
+        manager. Default to Coordinated Universal Time (UTC).
+
+        Returns:
+            pytz.timezone: Timezone instance or UTC if not found.
+        """
+
+        self.ensure_one()
+
+        tz = self.partner_id.tz or self.company_id.partner_id.tz or \
+            self.manager_id.partner_id.tz
+
+        return get_timezone(tz or 'UTC')
+
     @staticmethod
-    def _compute_row(reservation, facility_url, reservation_url):
+    def _compute_row(reservation, facility_url, reservation_url, tz=None):
         """ Get a dictionary with the reservation data, formatted and ready for
         inclusion in an notification email.
 
@@ -560,6 +775,8 @@ class FacilityComplex(models.Model):
                                 view for the facility.facility model.
             reservation_url (str): URL without resource ID relative to the form
                                    view for the facility.reservation model.
+            tz (tzinfo, optional): timezone used to localize dates, it will
+                                   be computed from the reservation if None
 
         Returns:
             dict: reservation data, formatted and ready for inclusion in email
@@ -570,6 +787,8 @@ class FacilityComplex(models.Model):
         facility = reservation.facility_id
         manager = reservation.manager_id
 
+        tz = tz or reservation.get_tz()
+
         row = {
             'id': reservation.id,
             'facility': facility.name,
@@ -579,16 +798,17 @@ class FacilityComplex(models.Model):
             'manager_phone': manager.phone,
             'url': reservation_url.format(reservation.id),
             'date_start':
-                reservation.get_localized('date_start', '%c'),
+                reservation.get_localized('date_start', '%c', tz),
             'date_stop':
-                reservation.get_localized('date_stop', '%c'),
+                reservation.get_localized('date_stop', '%c', tz),
             'create_date':
-                reservation.get_localized('create_date', '%c')
+                reservation.get_localized('create_date', '%c', tz)
         }
 
         return row
 
-    def _compute_rows(self, cron_domain=None, filter_domain=None):
+    def _compute_rows(self, cron_domain=None, filter_domain=None,
+                      reservation_set=None, urls=None):
         """ Get a list of formatted reservation dictionaries will be used as
         reservation data, formatted and ready for inclusion in email
         notifications.
@@ -598,28 +818,41 @@ class FacilityComplex(models.Model):
                                           based on the last cron job run time.
             filter_domain (list, optional): additional filtering constraints
                                             on the reservations.
+            reservation_set (models.Model, optional): reservations already
+                                                      retrieved for complex
+            urls (tuple, optional): ``(facility_url, reservation_url)`` base
+                                    URLs already computed
 
         Returns:
-            models.Model: A recordset containing reservations that match the
-                          given criteria
+            list: formatted reservation dictionaries
         """
 
-        reservation_set = self._compute_requested(cron_domain, filter_domain)
+        self.ensure_one()
 
-        reservation_url = self._get_form_view_base_url(
-            'facility.reservation', 'facility_management.menu_reservations')
-        facility_url = self._get_form_view_base_url(
-            'facility.facility', 'facility_management.menu_facilities')
+        if reservation_set is None:
+            reservation_set = \
+                self._compute_requested(cron_domain, filter_domain)
 
-        rows = []
-        if reservation_set:
-            for reservation in reservation_set:
-                row = self._compute_row(
-                    reservation, facility_url, reservation_url)
+        if not reservation_set:
+            return []
 
-                rows.append(row)
+        facility_url, reservation_url = urls or self._get_form_view_urls()
 
-        return rows
+        tz = self.get_tz()
+
+        return [
+            self._compute_row(reservation, facility_url, reservation_url, tz)
+            for reservation in reservation_set
+        ]
+
+    @api.model
+    def _get_form_view_urls(self):
+        facility_url = self._get_form_view_base_url(
+            'facility.facility', 'facility_management.menu_facilities')
+        reservation_url = self._get_form_view_base_url(
+            'facility.reservation', 'facility_management.menu_reservations')
+
+        return facility_url, reservation_url
 
     def notify_reservation_requests(self, filter_domain=False, is_cron=False):
         """ Send notifications about pending facility reservation requests.
@@ -628,6 +861,11 @@ class FacilityComplex(models.Model):
         are awaiting approval, using the provided filter and based on whether
         it's triggered by the cron or manually.
 
+        Requested reservations of all the complexes are retrieved in a single
+        search and grouped by complex, timezone, URLs and recipients are
+        computed once per complex and mails are queued to be sent by the
+        mail queue.
+
         Args:
             filter_domain (list, optional): additional filtering constraints
                                             on the reservations.
@@ -640,6 +878,8 @@ class FacilityComplex(models.Model):
             bool: always True
         """
 
+        started = perf_counter()
+
         if is_cron:
             complex_set = self.search(TRUE_DOMAIN)
             cron_domain = self._compute_cron_lastcall_domain()
@@ -647,27 +887,30 @@ class FacilityComplex(models.Model):
             complex_set = self
             cron_domain = False
 
+        notified, row_count = 0, 0
+
         if complex_set:
 
             template_xid = \
                 'facility_management.mail_notify_reservation_requests'
             mail_template = self.env.ref(template_xid)
 
-            for record in complex_set:
-                rows = record._compute_rows(cron_domain, filter_domain)
-
-                if not rows:
-                    continue
-
-                context = record.env.context.copy()
-                context.update(rows=rows)
+            grouped = complex_set._group_requested(cron_domain, filter_domain)
+            urls = self._get_form_view_urls()
 
+            for record in complex_set.browse(list(grouped.keys())):
                 partner_set, email_to_list = \
                     record._compute_notify_requests_recipients()
 
                 if not email_to_list:
                     continue
 
+                rows = record._compute_rows(
+                    reservation_set=grouped[record.id], urls=urls)
+
+                context = record.env.context.copy()
+                context.update(rows=rows)
+
                 email_values = {
                     'email_to': ', '.join(email_to_list),
                     'partner_ids': partner_set.ids
@@ -677,6 +920,13 @@ class FacilityComplex(models.Model):
                 context_template.send_mail(
                     record.id, force_send=False, email_values=email_values)
 
+                notified += 1
+                row_count += len(rows)
+
+        msg = ('Reservation requests: {} complexes notified with {} rows '
+               'in {:.3f} seconds')
+        _logger.info(msg.format(notified, row_count, perf_counter() - started))
+
         return True
 
     @api.model
@@ -6,6 +6,7 @@
 
 from odoo import models, fields
 from odoo.tools import drop_view_if_exists
+from odoo.tools.sql import table_kind
 
 from logging import getLogger
 
@@ -15,7 +16,11 @@ _logger = getLogger(__name__)
 
 class FacilityComplexFacilityReservationRel(models.Model):
     """ This act as middle relation in many to many relationship between
-    model.name and model.name
+    facility.complex and facility.reservation
+
+    It is a plain table maintained by triggers on reservations, facilities
+    and complexes, so it can be indexed. Rows are removed along with their
+    reservations or complexes through the foreign keys.
     """
 
     _name = 'facility.complex.facility.reservation.rel'
@@ -53,10 +58,24 @@ class FacilityComplexFacilityReservationRel(models.Model):
         auto_join=False
     )
 
+    company_id = fields.Many2one(
+        string='Company',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Company to which the complex belongs',
+        comodel_name='res.company',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
     state = fields.Selection(
         string='State',
         required=True,
-        readonly=False,
+        readonly=True,
         index=True,
         default='requested',
         help='Current reservation status',
@@ -68,41 +87,167 @@ class FacilityComplexFacilityReservationRel(models.Model):
         groups="facility_management.facility_group_monitor"
     )
 
-    def prevent_actions(self):
-        actions = ['INSERT', 'UPDATE', 'DELETE']
-
-        BASE_SQL = '''
-            CREATE OR REPLACE RULE {table}_{action} AS
-                ON {action} TO {table} DO INSTEAD NOTHING
-        '''
-
-        for action in actions:
-            sql = BASE_SQL.format(table=self._table, action=action)
-            self.env.cr.execute(sql)
-
     def init(self):
-        sentence = '''CREATE or REPLACE VIEW {} as ({})'''
-
-        drop_view_if_exists(self.env.cr, self._table)
-
-        self.env.cr.execute(sentence.format(self._table, self._view_sql))
-
-        self.prevent_actions()
+        cr = self.env.cr
+
+        kind = table_kind(cr, self._table)
+        if kind == 'v':
+            drop_view_if_exists(cr, self._table)
+
+        if kind != 'r':
+            cr.execute(self._create_table_sql)
+
+        cr.execute(self._sync_function_sql.format(
+            select=self._rows_sql.format(
+                where='fr."id" = ANY ( reservation_ids )')))
+        cr.execute(self._triggers_sql)
+
+        if kind != 'r':
+            _logger.info(f'Populating {self._table}')
+            cr.execute(self._populate_sql.format(
+                select=self._rows_sql.format(where='TRUE')))
+
+    # Table has one row per reservation in an active facility, the row id
+    # is the reservation id
+    _create_table_sql = '''
+        CREATE TABLE facility_complex_facility_reservation_rel (
+            "id" INTEGER NOT NULL PRIMARY KEY,
+            complex_id INTEGER NOT NULL
+                REFERENCES facility_complex ( "id" ) ON DELETE CASCADE,
+            reservation_id INTEGER NOT NULL
+                REFERENCES facility_reservation ( "id" ) ON DELETE CASCADE,
+            company_id INTEGER,
+            "state" VARCHAR NOT NULL,
+            create_uid INTEGER,
+            create_date TIMESTAMP WITHOUT TIME ZONE,
+            write_uid INTEGER,
+            write_date TIMESTAMP WITHOUT TIME ZONE
+        );
+
+        CREATE UNIQUE INDEX facility_complex_reservation_rel_reservation_index
+            ON facility_complex_facility_reservation_rel ( reservation_id );
+
+        CREATE INDEX facility_complex_reservation_rel_complex_index
+            ON facility_complex_facility_reservation_rel ( complex_id, "state" );
+
+        CREATE INDEX facility_complex_reservation_rel_requested_index
+            ON facility_complex_facility_reservation_rel ( complex_id )
+            WHERE "state" = 'requested';
+
+        CREATE INDEX facility_complex_reservation_rel_company_index
+            ON facility_complex_facility_reservation_rel ( company_id );
+    '''
 
-    # Raw sentence used to create new model based on SQL VIEW
-    _view_sql = '''
+    _rows_sql = '''
         SELECT
-            fc."id" AS complex_id,
+            fr."id" AS "id",
+            ff.complex_id,
             fr."id" AS reservation_id,
-            fr.create_date,
+            fc.company_id,
+            fr."state",
             fr.create_uid,
-            fr.write_date,
+            fr.create_date,
             fr.write_uid,
-            fr."state"
+            fr.write_date
         FROM
-            facility_complex AS fc
+            facility_reservation AS fr
         INNER JOIN facility_facility AS ff
-            ON ff.complex_id = fc."id" AND ff.active
-        INNER JOIN facility_reservation AS fr
-            ON fr.facility_id = ff."id"
+            ON ff."id" = fr.facility_id AND ff.active
+        INNER JOIN facility_complex AS fc
+            ON fc."id" = ff.complex_id
+        WHERE
+            {where}
+    '''
+
+    _populate_sql = '''
+        DELETE FROM facility_complex_facility_reservation_rel;
+
+        INSERT INTO facility_complex_facility_reservation_rel (
+            "id", complex_id, reservation_id, company_id, "state",
+            create_uid, create_date, write_uid, write_date
+        ) {select}
+    '''
+
+    _sync_function_sql = '''
+        CREATE OR REPLACE FUNCTION facility_complex_reservation_rel_sync (
+            reservation_ids INTEGER[]
+        ) RETURNS VOID AS $$
+        BEGIN
+            DELETE FROM facility_complex_facility_reservation_rel
+            WHERE "id" = ANY ( reservation_ids );
+
+            INSERT INTO facility_complex_facility_reservation_rel (
+                "id", complex_id, reservation_id, company_id, "state",
+                create_uid, create_date, write_uid, write_date
+            ) {select};
+        END;
+        $$ LANGUAGE plpgsql;
+    '''
+
+    _triggers_sql = '''
+        CREATE OR REPLACE FUNCTION facility_complex_reservation_rel_reservation ()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM facility_complex_reservation_rel_sync ( ARRAY[NEW."id"] );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION facility_complex_reservation_rel_facility ()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM facility_complex_reservation_rel_sync ( ARRAY (
+                SELECT "id" FROM facility_reservation
+                WHERE facility_id = NEW."id"
+            ) );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION facility_complex_reservation_rel_complex ()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE facility_complex_facility_reservation_rel
+                SET company_id = NEW.company_id
+            WHERE complex_id = NEW."id";
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS facility_complex_reservation_rel_insert
+            ON facility_reservation;
+        CREATE TRIGGER facility_complex_reservation_rel_insert
+            AFTER INSERT ON facility_reservation
+            FOR EACH ROW
+            EXECUTE PROCEDURE facility_complex_reservation_rel_reservation ();
+
+        DROP TRIGGER IF EXISTS facility_complex_reservation_rel_update
+            ON facility_reservation;
+        CREATE TRIGGER facility_complex_reservation_rel_update
+            AFTER UPDATE OF facility_id, "state" ON facility_reservation
+            FOR EACH ROW
+            WHEN (
+                OLD.facility_id IS DISTINCT FROM NEW.facility_id
+                OR OLD."state" IS DISTINCT FROM NEW."state"
+            )
+            EXECUTE PROCEDURE facility_complex_reservation_rel_reservation ();
+
+        DROP TRIGGER IF EXISTS facility_complex_reservation_rel_facility
+            ON facility_facility;
+        CREATE TRIGGER facility_complex_reservation_rel_facility
+            AFTER UPDATE OF complex_id, active ON facility_facility
+            FOR EACH ROW
+            WHEN (
+                OLD.complex_id IS DISTINCT FROM NEW.complex_id
+                OR OLD.active IS DISTINCT FROM NEW.active
+            )
+            EXECUTE PROCEDURE facility_complex_reservation_rel_facility ();
+
+        DROP TRIGGER IF EXISTS facility_complex_reservation_rel_complex
+            ON facility_complex;
+        CREATE TRIGGER facility_complex_reservation_rel_complex
+            AFTER UPDATE OF company_id ON facility_complex
+            FOR EACH ROW
+            WHEN ( OLD.company_id IS DISTINCT FROM NEW.company_id )
+            EXECUTE PROCEDURE facility_complex_reservation_rel_complex ();
     '''
@@ -7,8 +7,9 @@
 from odoo import models, fields, api
 from odoo.tools.translate import _
 from odoo.tools import safe_eval
-from odoo.osv.expression import TRUE_DOMAIN, FALSE_DOMAIN
 from odoo.exceptions import UserError
+from odoo.addons.facility_management.utils.sql_utils import \
+    aggregate_domain
 
 from datetime import datetime, timedelta
 
@@ -21,6 +22,14 @@ from re import sub
 _logger = getLogger(__name__)
 
 
+OCCUPANCY_BUCKETS = {
+    'hour': '1 hour',
+    'day': '1 day',
+    'week': '1 week',
+    'month': '1 month'
+}
+
+
 class FacilityFacility(models.Model):
     """ Facility, like a classroom, laboratory, workshop,...
     """
@@ -181,191 +190,165 @@ class FacilityFacility(models.Model):
         string='Reservation count',
         required=False,
         readonly=True,
-        index=False,
+        index=True,
         default=0,
         help='Number of reservations for this facility',
         compute='_compute_reservation_count',
-        search='_search_reservation_count'
+        store=True
     )
 
-    @api.depends('reservation_ids')
+    @api.depends('reservation_ids', 'reservation_ids.active')
     def _compute_reservation_count(self):
-        for record in self:
-            record.reservation_count = len(record.reservation_ids)
-
-    @api.model
-    def _search_reservation_count(self, operator, value):
-        domain = FALSE_DOMAIN
-
-        if value is True:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator == '=' else FALSE_DOMAIN
-
-        elif value is False:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator != '=' else FALSE_DOMAIN
-
-        else:
-
-            sql = self._search_reservation_count_sql
-
-            self.env.cr.execute(sql.format(operator=operator, value=value))
-            rows = self.env.cr.dictfetchall()
-
-            if not rows:
-                return FALSE_DOMAIN
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'facility_id', self.filtered('id').ids)
 
-            facility_ids = [row['facility_id'] for row in (rows or [])]
+        for record in self:
+            record.reservation_count = counts.get(record.id, 0)
 
-            domain = [('id', 'in', facility_ids)]
+    confirmed_reservation_count = fields.Integer(
+        string='Confirmed reservations',
+        required=False,
+        readonly=True,
+        index=True,
+        default=0,
+        help='Number of confirmed reservations for this facility',
+        compute='_compute_confirmed_reservation_count',
+        store=True
+    )
 
-        return domain
+    @api.depends('reservation_ids', 'reservation_ids.active',
+                 'reservation_ids.state')
+    def _compute_confirmed_reservation_count(self):
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'facility_id', self.filtered('id').ids,
+            [('state', '=', 'confirmed')])
 
-    _search_reservation_count_sql = '''
-         WITH active_reservations AS (
-            SELECT
-                "id" AS reservation_id,
-                facility_id
-            FROM
-                facility_reservation
-            WHERE
-                active
-                AND STATE = 'confirmed'
-        )
-        SELECT DISTINCT
-            aef."id" AS facility_id
-        FROM
-            facility_facility AS aef
-            LEFT JOIN active_reservations AS ar ON aef."id" = ar.facility_id
-        WHERE
-            aef.active
-        GROUP BY
-            aef."id"
-        HAVING
-            COUNT ( ar.facility_id ) {operator} {value}
-    '''
+        for record in self:
+            record.confirmed_reservation_count = counts.get(record.id, 0)
 
     next_use = fields.Datetime(
         string='Next use',
         required=False,
         readonly=True,
-        index=False,
+        index=True,
         default=None,
         help='Next time this facility will be used',
         compute='_compute_next_use',
-        search='_search_next_use'
+        store=True
     )
 
-    @api.depends('reservation_ids')
+    @api.depends('reservation_ids', 'reservation_ids.active',
+                 'reservation_ids.state', 'reservation_ids.date_start',
+                 'reservation_ids.date_stop', 'reservation_ids.validate')
     def _compute_next_use(self):
-        now = fields.Datetime.now()
-
-        for record in self:
-            reservation_set = record.reservation_ids
-            reservation_set = reservation_set.sorted(lambda x: x.date_start)
-            reservation_set = reservation_set.filtered(
-                lambda x: x.date_stop >= now)
-
-            if not reservation_set:
-                record.next_use = None
-            else:
-                record.next_use = reservation_set[0].date_start
-
-    @api.model
-    def _search_next_use(self, operator, value):
-        """ This uses SQL ``tsrange`` to search valid facilities. Returns a
-        domain with valid IDs.
-
-        All the operators compare the user-supplied date/time value with any of
-        the values in the date/time range of the reservation used to calculate
-        the value of ``next_use`` field.
-
-        NOTE: the behavior of the method for those cases where the user selects
-        "between" may be abnormal.
-
-        NOTE: Only active and confirmed reservations will be used.
-
-        Args:
-            operator (str): the operator that has been chosen by the user
-            value (datetime|bool): value that has been given by the user
-
-        Returns:
-            list: domain like [('id', 'in', facility_ids)]
-
-        Raises:
-            UserError: if the given operator has not been considered for this
-            implementation.
+        """ Start of the first active confirmed reservation which has not
+        finished yet. All the records are computed in a single query which
+        reads, for each facility, a few entries of the partial indexes:
+
+        - The last validated reservation started before now, if it has not
+          finished yet. Validated reservations cannot overlap, so it is the
+          only validated one which can be in progress.
+        - The first not validated reservation in progress. These can
+          overlap, so they are looked for among the ones not finished yet.
+        - The first reservation starting from now.
         """
 
-        sql = self._search_next_use_sql
-        TSR = '''
-            {nq} date_range
-            {op} tsrange(\'{dt}\'::TIMESTAMP, \'{dt}\'::TIMESTAMP, \'[]\')
-        '''
-
-        domain = FALSE_DOMAIN
-
-        # '=', '!=', '<=', '<', '>', '>='
-        if value is False:
-            if operator == '=':  # next_use is not set
-                clausule = 'date_range IS NULL'
-            else:  # next_use is set
-                clausule = 'date_range IS NOT NULL'
-        elif operator == '=':
-            clausule = TSR.format(nq='', dt=value, op='@>')
-        elif operator == '!=':
-            clausule = TSR.format(nq='NOT', dt=value, op='@>')
-        elif operator == '<':
-            clausule = TSR.format(nq='', dt=value, op='<<')
-        elif operator == '<=':
-            clausule = TSR.format(nq='', dt=value, op='&<')
-        elif operator == '>':
-            clausule = TSR.format(nq='', dt=value, op='>>')
-        elif operator == '>=':
-            clausule = TSR.format(nq='', dt=value, op='&>')
-        else:
-            raise UserError('Operator not implemented')
-
-        sql = sql.format(clausule=clausule)
-        self.env.cr.execute(sql)
-        rows = self.env.cr.dictfetchall()
+        next_uses = {}
 
-        if rows:
-            facility_ids = [row['facility_id'] for row in (rows or [])]
-            domain = [('id', 'in', facility_ids)]
+        facility_ids = self.filtered('id').ids
+        if facility_ids:
+            reservation_obj = self.env['facility.reservation']
+            reservation_obj.flush([
+                'facility_id', 'date_start', 'date_stop', 'active', 'state',
+                'validate'
+            ])
 
-        return domain
+            params = {
+                'facility_ids': facility_ids,
+                'now': fields.Datetime.now()
+            }
+            self.env.cr.execute(self._compute_next_use_sql, params)
+            next_uses = dict(self.env.cr.fetchall())
 
-    _search_next_use_sql = '''
-        WITH active_reservations AS (
+        for record in self:
+            record.next_use = next_uses.get(record.id, None)
+
+    _compute_next_use_sql = '''
+        SELECT
+            ff."id",
+            COALESCE (
+                LEAST ( latest.date_start, unvalidated.date_start ),
+                upcoming.date_start
+            ) AS next_use
+        FROM
+            unnest ( %(facility_ids)s::INTEGER[] ) AS ff ( "id" )
+        LEFT JOIN LATERAL (
+            SELECT
+                fr.date_start,
+                fr.date_stop
+            FROM
+                facility_reservation AS fr
+            WHERE
+                fr.facility_id = ff."id"
+                AND fr.active
+                AND fr."state" = 'confirmed'
+                AND fr.validate
+                AND fr.date_start < %(now)s::TIMESTAMP
+            ORDER BY
+                fr.date_start DESC
+            LIMIT 1
+        ) AS latest ON latest.date_stop >= %(now)s::TIMESTAMP
+        LEFT JOIN LATERAL (
             SELECT
-                "id" AS reservation_id,
-                facility_id,
-                date_start,
-                date_stop
+                fr.date_start
             FROM
-                facility_reservation
+                facility_reservation AS fr
             WHERE
-                active
-                AND STATE = 'confirmed'
-                AND date_stop >= CURRENT_TIMESTAMP AT TIME ZONE 'utc'
-        ), targets AS (
+                fr.facility_id = ff."id"
+                AND fr.active
+                AND fr."state" = 'confirmed'
+                AND NOT fr.validate
+                AND fr.date_stop >= %(now)s::TIMESTAMP
+                AND fr.date_start < %(now)s::TIMESTAMP
+            ORDER BY
+                fr.date_start ASC
+            LIMIT 1
+        ) AS unvalidated ON TRUE
+        LEFT JOIN LATERAL (
             SELECT
-                aef."id" AS facility_id,
-                CASE WHEN date_start IS NOT NULL AND date_stop IS NOT NULL
-                    THEN tsrange(date_start, date_stop, '[]')
-                    ELSE NULL
-                END AS date_range
+                fr.date_start
             FROM
-                facility_facility AS aef
-            LEFT JOIN active_reservations AS ar
-                ON aef."id" = ar.facility_id
+                facility_reservation AS fr
             WHERE
-                aef.active
-        ) SELECT
-            *
-        FROM targets
-        WHERE {clausule}
+                fr.facility_id = ff."id"
+                AND fr.active
+                AND fr."state" = 'confirmed'
+                AND fr.date_start >= %(now)s::TIMESTAMP
+            ORDER BY
+                fr.date_start ASC
+            LIMIT 1
+        ) AS upcoming ON TRUE
     '''
 
+    @api.model
+    def cron_update_next_use(self):
+        """ The stored ``next_use`` value only becomes stale when time
+        passes, so the facilities whose next use has already begun are
+        recomputed periodically.
+        """
+
+        domain = [('next_use', '<=', fields.Datetime.now())]
+        facility_set = self.with_context(active_test=False).search(domain)
+
+        if facility_set:
+            self.env.add_to_compute(self._fields['next_use'], facility_set)
+            self.recompute()
+
+        _logger.debug(
+            'Next use updated for {} facilities'.format(len(facility_set)))
+
     color = fields.Integer(
         string='Color',
         required=True,
@@ -389,6 +372,88 @@ class FacilityFacility(models.Model):
             else:
                 record.color = 1
 
+    conflict_count = fields.Integer(
+        string='Conflicts',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0,
+        help=('Number of searched occurrences in conflict with existing '
+              'reservations'),
+        compute='_compute_conflict_count',
+        search='_search_conflict_count'
+    )
+
+    @api.depends_context('conflict_intervals')
+    def _compute_conflict_count(self):
+        counts = {}
+
+        intervals = self._get_conflict_intervals()
+        record_ids = self.filtered('id').ids
+        if intervals and record_ids:
+            facility_obj = self.with_context(active_test=False)
+            counts = facility_obj.conflict_counts(
+                intervals, [('id', 'in', record_ids)])
+
+        for record in self:
+            record.conflict_count = counts.get(record.id, 0)
+
+    def _search_conflict_count(self, operator, value):
+        intervals = self._get_conflict_intervals()
+        starts = [interval[0] for interval in intervals]
+        stops = [interval[1] for interval in intervals]
+
+        return aggregate_domain(self._search_conflict_count_sql, operator,
+                                value, params=[starts, stops])
+
+    _search_conflict_count_sql = '''
+        SELECT
+            ff."id"
+        FROM
+            facility_facility AS ff
+        WHERE
+            (
+                SELECT
+                    COUNT ( * )
+                FROM
+                    unnest ( %s::TIMESTAMP[], %s::TIMESTAMP[] )
+                        AS c ( date_start, date_stop )
+                WHERE
+                    EXISTS (
+                        SELECT
+                            1
+                        FROM
+                            facility_reservation AS fr
+                        WHERE
+                            fr.facility_id = ff."id"
+                            AND fr.active
+                            AND fr.validate
+                            AND fr."state" = 'confirmed'
+                            AND tsrange ( fr.date_start, fr.date_stop )
+                                && tsrange ( c.date_start, c.date_stop )
+                    )
+            ) {comparison}
+    '''
+
+    @api.model
+    def _get_conflict_intervals(self):
+        """ Occurrences searched by the search available wizard. They are
+        given in the context as ``[date_start, date_stop]`` pairs of strings,
+        so they survive the JSON round-trip, and conflicts are counted from
+        them for the facilities being read or searched.
+
+        Returns:
+            list: list of ``(date_start, date_stop)`` tuples
+        """
+
+        intervals = self.env.context.get('conflict_intervals') or []
+
+        return [
+            (fields.Datetime.to_datetime(date_start),
+             fields.Datetime.to_datetime(date_stop))
+            for date_start, date_stop in intervals
+        ]
+
     _sql_constraints = [
         (
             'UNIQUE_NAME_BY_COMPLEX',
@@ -497,7 +562,56 @@ class FacilityFacility(models.Model):
         return serialized
 
     @api.model
-    def available(self, date_start=None, date_stop=None, type_ids=None):
+    def _available_facility_query(self, domain=None):
+        """ Builds the ORM query used to select candidate facilities. Record
+        rules and ``active_test`` are applied just as in ``search``. Pending
+        changes of facilities and reservations are flushed first, since the
+        query is run outside the ORM.
+
+        Args:
+            domain (list, optional): additional facility domain
+
+        Returns:
+            tuple: ``(from_clause, where_clause, params, order_by)``
+        """
+
+        self._flush_search(domain or [], order=self._order)
+        self.flush(['active'])
+        self.env['facility.reservation'].flush([
+            'facility_id', 'date_start', 'date_stop', 'active', 'state',
+            'validate'
+        ])
+
+        query = self._where_calc(domain or [])
+        self._apply_ir_rules(query, 'read')
+        order_by = self._generate_order_by(None, query)
+
+        from_clause, where_clause, params = query.get_sql()
+
+        return from_clause, where_clause or 'TRUE', params, order_by
+
+    @api.model
+    def available(self, date_start=None, date_stop=None, type_ids=None,
+                  complex_ids=None):
+        """ Search for the facilities that are not occupied by any blocking
+        reservation in the given time interval.
+
+        Only active, validated and confirmed reservations are considered, that
+        is, the same ones checked by the ``unique_facility_id`` exclusion
+        constraint. The whole search is done in a single SQL statement using
+        ``tsrange`` overlap, so the btree_gist index of that constraint can be
+        used.
+
+        Args:
+            date_start (datetime, optional): lower limit of the interval
+            date_stop (datetime, optional): upper limit of the interval
+            type_ids (list|models.Model, optional): restrict to facility types
+            complex_ids (list|models.Model, optional): restrict to complexes
+
+        Returns:
+            models.Model: facility.facility recordset with free facilities
+        """
+
         if not date_start:
             if not date_stop:
                 date_start = fields.Datetime.now()
@@ -507,26 +621,8 @@ class FacilityFacility(models.Model):
         if not date_stop:
             date_stop = date_start + timedelta(hours=1)
 
-        reservation_obj = self.env['facility.reservation']
-        reservation_domain = [
-            '|',
-            '&',
-            ('date_start', '>=', date_start),
-            ('date_start', '<', date_stop),
-            '&',
-            ('date_stop', '>', date_start),
-            ('date_stop', '<', date_stop)
-        ]
-        reservation_set = reservation_obj.search(reservation_domain)
-
-        facility_obj = self.env['facility.facility']
         facility_domain = []
 
-        exclude_ids = reservation_set.mapped('facility_id.id')
-        if exclude_ids:
-            exclude_leaf = ('id', 'not in', exclude_ids)
-            facility_domain.append(exclude_leaf)
-
         if type_ids:
             if isinstance(type_ids, models.Model):
                 type_ids = type_ids.mapped('id')
@@ -534,12 +630,243 @@ class FacilityFacility(models.Model):
             type_leaf = ('type_id', 'in', type_ids)
             facility_domain.append(type_leaf)
 
-        msg = 'Search available facilities: {}'
-        _logger.debug(msg.format(facility_domain))
-        facility_set = facility_obj.search(facility_domain)
+        if complex_ids:
+            if isinstance(complex_ids, models.Model):
+                complex_ids = complex_ids.mapped('id')
+
+            complex_leaf = ('complex_id', 'in', complex_ids)
+            facility_domain.append(complex_leaf)
+
+        from_clause, where_clause, params, order_by = \
+            self._available_facility_query(facility_domain)
+
+        sql = self._available_sql.format(
+            from_clause=from_clause, where_clause=where_clause,
+            order_by=order_by)
+        params = params + [date_start, date_stop]
+
+        msg = 'Search available facilities: {} from {} to {}'
+        _logger.debug(msg.format(facility_domain, date_start, date_stop))
+
+        self.env.cr.execute(sql, params)
+        facility_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        return self.browse(facility_ids)
+
+    _available_sql = '''
+        SELECT
+            facility_facility."id"
+        FROM
+            {from_clause}
+        WHERE
+            {where_clause}
+            AND NOT EXISTS (
+                SELECT
+                    1
+                FROM
+                    facility_reservation AS fr
+                WHERE
+                    fr.facility_id = facility_facility."id"
+                    AND fr.active
+                    AND fr.validate
+                    AND fr."state" = 'confirmed'
+                    AND tsrange ( fr.date_start, fr.date_stop )
+                        && tsrange ( %s::TIMESTAMP, %s::TIMESTAMP )
+            )
+        {order_by}
+    '''
+
+    @api.model
+    def conflict_counts(self, intervals, domain=None):
+        """ Count, for each facility, how many of the given time intervals
+        overlap with at least one blocking reservation.
+
+        All the intervals are sent to the database as a pair of arrays, so the
+        whole recurrence is solved in a single round-trip no matter how many
+        occurrences it has.
+
+        Args:
+            intervals (list): list of ``(date_start, date_stop)`` tuples
+            domain (list, optional): additional facility domain
+
+        Returns:
+            dict: ``{facility_id: conflicting_occurrences}`` following the
+            model order
+        """
+
+        starts = [interval[0] for interval in intervals or []]
+        stops = [interval[1] for interval in intervals or []]
+
+        from_clause, where_clause, params, order_by = \
+            self._available_facility_query(domain)
+
+        sql = self._conflict_counts_sql.format(
+            from_clause=from_clause, where_clause=where_clause,
+            order_by=order_by)
+        params = [starts, stops] + params
+
+        self.env.cr.execute(sql, params)
+
+        return {row[0]: row[1] for row in self.env.cr.fetchall()}
+
+    _conflict_counts_sql = '''
+        WITH candidates AS (
+            SELECT
+                tsrange ( c.date_start, c.date_stop ) AS span
+            FROM
+                unnest ( %s::TIMESTAMP[], %s::TIMESTAMP[] )
+                    AS c ( date_start, date_stop )
+        )
+        SELECT
+            facility_facility."id",
+            (
+                SELECT
+                    COUNT ( * )
+                FROM
+                    candidates AS c
+                WHERE
+                    EXISTS (
+                        SELECT
+                            1
+                        FROM
+                            facility_reservation AS fr
+                        WHERE
+                            fr.facility_id = facility_facility."id"
+                            AND fr.active
+                            AND fr.validate
+                            AND fr."state" = 'confirmed'
+                            AND tsrange ( fr.date_start, fr.date_stop )
+                                && c.span
+                    )
+            )::INTEGER AS conflicts
+        FROM
+            {from_clause}
+        WHERE
+            {where_clause}
+        {order_by}
+    '''
+
+    @api.model
+    def occupancy_matrix(self, date_start, date_stop, bucket='day',
+                         domain=None):
+        """ Compute the occupied hours of each facility in each time bucket
+        of the given period. Reservation ranges are intersected with the
+        buckets in PostgreSQL, each reservation only expands the buckets it
+        spans, so the cost depends on the reservations in the period.
+
+        Only active and confirmed reservations are taken into account. Dates
+        and buckets are in UTC.
+
+        Args:
+            date_start (datetime): beginning of the period
+            date_stop (datetime): end of the period (not included)
+            bucket (str, optional): hour, day, week or month
+            domain (list, optional): facility domain
+
+        Returns:
+            dict: ``buckets`` (list of bucket starts), ``facility_ids`` (list)
+            and ``matrix``, a list with a row of occupied hours by facility,
+            following the ``facility_ids`` order, and a column by bucket
+
+        Raises:
+            UserError: if the bucket is not supported
+        """
 
-        return facility_set
+        step = OCCUPANCY_BUCKETS.get(bucket)
+        if not step:
+            raise UserError(_('Unsupported time bucket: %s') % bucket)
 
+        facility_ids = self.search(domain or []).ids
+
+        params = {
+            'facility_ids': facility_ids,
+            'date_start': fields.Datetime.to_datetime(date_start),
+            'date_stop': fields.Datetime.to_datetime(date_stop),
+            'unit': bucket,
+            'step': step
+        }
+
+        self.env.cr.execute(self._occupancy_buckets_sql, params)
+        buckets = [row[0] for row in self.env.cr.fetchall()]
+
+        positions = {value: index for index, value in enumerate(buckets)}
+        rows = {facility_id: [0.0] * len(buckets)
+                for facility_id in facility_ids}
+
+        if facility_ids and buckets:
+            reservation_obj = self.env['facility.reservation']
+            reservation_obj.flush([
+                'facility_id', 'date_start', 'date_stop', 'active', 'state'
+            ])
+
+            self.env.cr.execute(self._occupancy_matrix_sql, params)
+            for facility_id, value, hours in self.env.cr.fetchall():
+                rows[facility_id][positions[value]] = float(hours)
+
+        return {
+            'bucket': bucket,
+            'buckets': buckets,
+            'facility_ids': facility_ids,
+            'matrix': [rows[facility_id] for facility_id in facility_ids]
+        }
+
+    _occupancy_buckets_sql = '''
+        SELECT
+            b.bucket
+        FROM
+            generate_series (
+                date_trunc ( %(unit)s, %(date_start)s::TIMESTAMP ),
+                %(date_stop)s::TIMESTAMP,
+                %(step)s::INTERVAL
+            ) AS b ( bucket )
+        WHERE
+            b.bucket < %(date_stop)s::TIMESTAMP
+        ORDER BY
+            b.bucket ASC
+    '''
+
+    _occupancy_matrix_sql = '''
+        WITH spans AS (
+            SELECT
+                fr.facility_id,
+                tsrange ( fr.date_start, fr.date_stop )
+                    * tsrange (
+                        %(date_start)s::TIMESTAMP, %(date_stop)s::TIMESTAMP
+                    ) AS span
+            FROM
+                facility_reservation AS fr
+            WHERE
+                fr.facility_id = ANY ( %(facility_ids)s::INTEGER[] )
+                AND fr.active
+                AND fr."state" = 'confirmed'
+                AND fr.date_start < %(date_stop)s::TIMESTAMP
+                AND fr.date_stop > %(date_start)s::TIMESTAMP
+        )
+        SELECT
+            s.facility_id,
+            b.bucket,
+            SUM (
+                EXTRACT ( epoch FROM UPPER ( i.span ) - LOWER ( i.span ) )
+            ) / 3600.0 AS occupied_hours
+        FROM
+            spans AS s
+            CROSS JOIN LATERAL generate_series (
+                date_trunc ( %(unit)s, LOWER ( s.span ) ),
+                UPPER ( s.span ),
+                %(step)s::INTERVAL
+            ) AS b ( bucket )
+            CROSS JOIN LATERAL (
+                SELECT
+                    s.span * tsrange (
+                        b.bucket, b.bucket + %(step)s::INTERVAL
+                    ) AS span
+            ) AS i
+        WHERE
+            NOT isempty ( i.span )
+        GROUP BY
+            s.facility_id,
+            b.bucket
+    '''
 
 # 1 -> Naranja oscuro
 # 2 -> Naranja
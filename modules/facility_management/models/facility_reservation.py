@@ -9,11 +9,16 @@ from odoo.tools.translate import _
 from odoo.osv.expression import TRUE_DOMAIN, FALSE_DOMAIN
 from odoo.osv.expression import NEGATIVE_TERM_OPERATORS
 from odoo.exceptions import UserError, ValidationError
+from odoo.addons.facility_management.utils.timetable_cache import \
+    timetable_cache
+from odoo.addons.facility_management.utils.sql_utils import \
+    aggregate_domain
 
 from datetime import timedelta
-from odoo.tools import safe_eval
+from odoo.tools import safe_eval, split_every
 import pytz
 from datetime import datetime, date, time
+from time import perf_counter
 
 from logging import getLogger
 
@@ -206,28 +211,21 @@ class FacilityReservation(models.Model):
 
     @api.model
     def _search_date_delay(self, operator, value):
-        sql = '''
-            SELECT
-                "id" AS reservation_id
-            FROM facility_reservation
-            WHERE
-                active AND
-                (
-                    EXTRACT(epoch FROM (date_stop - date_start)) / 3600.0
-                ) {op} {val}
-        '''
-
-        sql = sql.format(op=operator, val=value)
-        self.env.cr.execute(sql)
-
-        rows = self.env.cr.dictfetchall()
-        if not rows:
-            domain = FALSE_DOMAIN
-        else:
-            reservation_ids = [row['reservation_id'] for row in (rows or [])]
-            domain = [('id', 'in', reservation_ids)]
-
-        return domain
+        return aggregate_domain(
+            self._search_date_delay_sql, operator, value)
+
+    _search_date_delay_sql = '''
+        SELECT
+            fr."id"
+        FROM
+            facility_reservation AS fr
+        WHERE
+            fr.active
+            AND (
+                EXTRACT ( epoch FROM ( fr.date_stop - fr.date_start ) )
+                / 3600.0
+            ) {comparison}
+    '''
 
     validate = fields.Boolean(
         string='Validate',
@@ -280,11 +278,10 @@ class FacilityReservation(models.Model):
     def _search_has_scheduler(self, operator, value):
         value = bool(value)  # Prevents None
 
-        if value is True:
-            operator = NEGATIVE_TERM_OPERATORS(operator)
+        if operator in NEGATIVE_TERM_OPERATORS:
             value = not value
 
-        return [('scheduler_id', operator, value)]
+        return [('scheduler_id', '!=' if value else '=', False)]
 
     reservation_count = fields.Integer(
         string='Reservation count',
@@ -329,21 +326,23 @@ class FacilityReservation(models.Model):
 
         self.ensure_one()
 
-        tz = self.mapped('facility_id.complex_id.partner_id.tz')
-        if not tz:
-            tz = self.mapped('facility_id.complex_id.company_id.partner_id.tz')
-        if not tz:
-            tz = self.mapped('facility_id.complex_id.manager_id.partner_id.tz')
-
-        tz = tz and tz[0] or 'UTC'  # First value in list or 'UTC'
+        facility_complex = self.facility_id.complex_id
+        if facility_complex:
+            return facility_complex.get_tz()
 
-        return pytz.timezone(tz)
+        return pytz.utc
 
-    def get_localized(self, field, strftime=None):
+    def get_localized(self, field, strftime=None, tz=None):
         """
         Converts and localizes a given datetime or date value to the specified
         timezone.
 
+        Args:
+            field (str): name of the date or datetime field
+            strftime (str, optional): format of the returned string
+            tz (tzinfo, optional): timezone, the reservation one will be used
+                                   if None
+
         Returns:
             datetime: localized date or datetime
         """
@@ -351,7 +350,7 @@ class FacilityReservation(models.Model):
         self.ensure_one()
 
         value = getattr(self, field)
-        tz = self.get_tz()
+        tz = tz or self.get_tz()
 
         if isinstance(value, datetime):
             dt = value
@@ -394,12 +393,33 @@ class FacilityReservation(models.Model):
         )
     ]
 
-    def _name_get(self):
+    def init(self):
+        """ Partial indexes used to compute the facility next use
+        """
+
+        self.env.cr.execute(self._next_use_index_sql)
+
+    _next_use_index_sql = '''
+        CREATE INDEX IF NOT EXISTS facility_reservation_next_use_index
+            ON facility_reservation ( facility_id, date_start )
+            WHERE active AND "state" = 'confirmed';
+
+        CREATE INDEX IF NOT EXISTS
+            facility_reservation_next_use_unvalidated_index
+            ON facility_reservation ( facility_id, date_stop )
+            WHERE active AND "state" = 'confirmed' AND NOT validate;
+    '''
+
+    def _name_get(self, allowed_complex_ids=None):
         """ Computes a single facility display name
 
         This is a private user-defined method, Not to be confused with the
         ``name_get`` starndard public method.
 
+        Args:
+            allowed_complex_ids (set, optional): complexes current user can
+            supervise, they will be checked one by one if None
+
         Returns:
             str: name will be shown in GUI
         """
@@ -413,8 +433,11 @@ class FacilityReservation(models.Model):
             facility = self.facility_id.name
 
             facility_complex = self.facility_id.complex_id
-            uid_is_allowed = facility_complex \
-                and facility_complex.is_an_allowed_supervisor()
+            if allowed_complex_ids is None:
+                uid_is_allowed = facility_complex \
+                    and facility_complex.is_an_allowed_supervisor()
+            else:
+                uid_is_allowed = facility_complex.id in allowed_complex_ids
 
             if uid_is_allowed and self.owner_id:
                 owner = self.owner_id.name
@@ -430,17 +453,25 @@ class FacilityReservation(models.Model):
         """ Only technicals can see the reservation owner. Other users see only
         facility name.
 
+        Facilities, complexes and owners are read for the whole recordset at
+        once and supervisor rights are checked once for each distinct
+        complex.
+
         Returns:
             tuple: ((id, name))
         """
 
-        result = []
+        unnamed_set = self.filtered(lambda r: not r.name)
+        complex_set = unnamed_set.mapped('facility_id.complex_id')
 
-        for record in self:
-            name = record._name_get()
-            result.append((record.id, name))
+        allowed_complex_ids = set(
+            item.id for item in complex_set if item.is_an_allowed_supervisor()
+        )
 
-        return result
+        return [
+            (record.id, record._name_get(allowed_complex_ids))
+            for record in self
+        ]
 
     @api.returns('self', lambda value: value.id)
     def copy(self, default=None):
@@ -609,30 +640,55 @@ class FacilityReservation(models.Model):
         if values.get('state', False) != 'confirmed':
             return True
 
+        return not self._unauthorized_complexes(values)
+
+    def _unauthorized_complexes(self, values):
+        """ Complexes in which the current user is not allowed to confirm
+        reservations. Rights are checked once for each distinct complex.
+
+        Parameters:
+            values (dict): The fields and their new values.
+
+        Returns:
+            models.Model: facility.complex recordset
+        """
+
         facility_id = values.get('facility_id', False)
         if facility_id:  # New facility will be set
             facility_set = self.env['facility.facility'].browse(facility_id)
         else:  # Current facility will be kept
             facility_set = self.mapped('facility_id')
 
-        for facility in facility_set:
-            if not facility.complex_id.is_an_allowed_supervisor():
-                return False
+        complex_set = facility_set.mapped('complex_id')
 
-        return True
+        return complex_set.filtered(
+            lambda record: not record.is_an_allowed_supervisor())
 
-    @api.model
-    def create(self, values):
+    @api.model_create_multi
+    def create(self, values_list):
         """ Overridden method 'create'
+
+        Authorization is checked only once for each one of the facilities
+        in which reservations are going to be confirmed.
         """
 
-        if not self.check_authorization_to_confirm(values):
-            msg = \
-                'You lack permission to confirm reservations in this complex'
-            raise ValidationError(msg)
+        facility_ids = set([
+            values.get('facility_id', False) for values in values_list
+            if values.get('state', False) == 'confirmed'
+        ])
+
+        for facility_id in facility_ids:
+            values = {'state': 'confirmed', 'facility_id': facility_id}
+            if not self.check_authorization_to_confirm(values):
+                msg = ('You lack permission to confirm reservations in '
+                       'this complex')
+                raise ValidationError(msg)
 
         parent = super(FacilityReservation, self)
-        result = parent.create(values)
+        result = parent.create(values_list)
+
+        result._invalidate_timetables()
+        result._refresh_timeline()
 
         return result
 
@@ -649,11 +705,287 @@ class FacilityReservation(models.Model):
                 'You lack permission to confirm reservations in this complex'
             raise ValidationError(msg)
 
+        targets = self._timetable_targets()
+
         parent = super(FacilityReservation, self)
         result = parent.write(values)
 
+        self._invalidate_timetables(targets)
+        self._refresh_timeline()
+
         return result
 
+    def unlink(self):
+        """ Overridden method 'unlink'
+        """
+
+        targets = self._timetable_targets()
+
+        parent = super(FacilityReservation, self)
+        result = parent.unlink()
+
+        timetable_cache.invalidate(self.env.cr.dbname, targets)
+        self._refresh_timeline()
+
+        return result
+
+    def bulk_write(self, values, chunk_size=500, track=False, summary=True):
+        """ Write the same values in a large number of reservations.
+
+        1. Authorization to confirm is checked once for each complex.
+        2. Exclusion constraint conflicts are checked in a single query, so
+           nothing is written if any reservation would fail.
+        3. Reservations are written in chunks, logging the progress, without
+           per-record mail tracking unless ``track`` is True.
+        4. A single summary message is posted in each affected complex.
+
+        Args:
+            values (dict): values to write
+            chunk_size (int, optional): reservations written at once
+            track (bool, optional): keep the per-record tracking messages
+            summary (bool, optional): post the summary messages, background
+                jobs post them once all their chunks have been processed
+
+        Returns:
+            dict: number of ``updated`` reservations, ``complexes`` and
+            ``elapsed`` time in seconds
+
+        Raises:
+            ValidationError: if the user cannot confirm reservations in some
+            complex or if some reservation would overlap another one
+        """
+
+        started = perf_counter()
+
+        if not self or not values:
+            return {'updated': 0, 'complexes': 0, 'elapsed': 0.0}
+
+        values = dict(values)
+        if values.get('state', False) == 'rejected':
+            if self.get_param('auto_archive_on_rejection', False):
+                values.update(active=False)
+
+        complex_set = self._unauthorized_complexes(values)
+        if complex_set:
+            msg = _('You lack permission to confirm reservations in: {}')
+            names = ', '.join(complex_set.mapped('name'))
+            raise ValidationError(msg.format(names))
+
+        self._check_bulk_conflicts(values)
+
+        target = self if track else self.with_context(mail_notrack=True)
+
+        total = len(self)
+        done = 0
+        for ids in split_every(chunk_size, self.ids):
+            chunk = target.browse(ids)
+            chunk.write(values)
+            chunk.flush()
+
+            done += len(ids)
+            _logger.info(f'Bulk update: {done} of {total} reservations')
+
+        complex_set = self.mapped('complex_id')
+        if summary:
+            complex_set._post_bulk_summary(self, self._describe_values(values))
+
+        elapsed = perf_counter() - started
+        _logger.info(f'Bulk update: {total} reservations in '
+                     f'{len(complex_set)} complexes updated in '
+                     f'{elapsed:.3f} seconds')
+
+        return {
+            'updated': total,
+            'complexes': len(complex_set),
+            'elapsed': elapsed
+        }
+
+    def _check_bulk_conflicts(self, values):
+        """ Check, in a single query, if the given values would make any
+        of these reservations violate the ``unique_facility_id`` constraint,
+        either with other reservations or between them.
+
+        Raises:
+            ValidationError: listing the overlapping reservations
+        """
+
+        self.flush([
+            'facility_id', 'date_start', 'date_stop', 'active', 'validate',
+            'state'
+        ])
+
+        date_start = fields.Datetime.to_datetime(values.get('date_start'))
+        date_stop = fields.Datetime.to_datetime(values.get('date_stop'))
+        facility_id = values.get('facility_id', False)
+
+        ids, facility_ids, starts, stops = [], [], [], []
+        for record in self:
+            if not values.get('active', record.active):
+                continue
+            if not values.get('validate', record.validate):
+                continue
+            if values.get('state', record.state) != 'confirmed':
+                continue
+
+            ids.append(record.id)
+            facility_ids.append(facility_id or record.facility_id.id)
+            starts.append(date_start or record.date_start)
+            stops.append(date_stop or record.date_stop)
+
+        if not ids:
+            return
+
+        params = {
+            'ids': ids,
+            'facility_ids': facility_ids,
+            'date_starts': starts,
+            'date_stops': stops,
+            'all_ids': self.ids
+        }
+        self.env.cr.execute(self._bulk_conflicts_sql, params)
+        rows = self.env.cr.fetchall()
+
+        if rows:
+            lines = [_('The following reservations would overlap:')]
+            for reservation_id, other_id in rows[:20]:
+                lines.append('{} - {}'.format(reservation_id, other_id))
+            if len(rows) > 20:
+                lines.append(_('... and {} more').format(len(rows) - 20))
+
+            raise ValidationError('\n'.join(lines))
+
+    def _describe_values(self, values):
+        """ Human readable description of the given values
+
+        Returns:
+            str: ``Field: value`` pairs separated by commas
+        """
+
+        parts = []
+
+        for name, value in values.items():
+            field = self._fields[name]
+
+            if field.type == 'selection':
+                options = dict(field._description_selection(self.env))
+                value = options.get(value, value)
+            elif field.type == 'boolean':
+                value = _('Yes') if value else _('No')
+            elif field.type == 'many2one':
+                comodel = self.env[field.comodel_name]
+                value = comodel.browse(value).display_name
+            elif field.type == 'datetime':
+                value = fields.Datetime.to_string(
+                    fields.Datetime.to_datetime(value))
+
+            parts.append('{}: {}'.format(field.string, value))
+
+        return ', '.join(parts)
+
+    _bulk_conflicts_sql = '''
+        WITH targets AS (
+            SELECT
+                t."id",
+                t.facility_id,
+                tsrange ( t.date_start, t.date_stop ) AS span
+            FROM
+                unnest (
+                    %(ids)s::INTEGER[],
+                    %(facility_ids)s::INTEGER[],
+                    %(date_starts)s::TIMESTAMP[],
+                    %(date_stops)s::TIMESTAMP[]
+                ) AS t ( "id", facility_id, date_start, date_stop )
+        )
+        SELECT
+            t."id",
+            fr."id"
+        FROM
+            targets AS t
+            INNER JOIN facility_reservation AS fr
+                ON fr.facility_id = t.facility_id
+                AND tsrange ( fr.date_start, fr.date_stop ) && t.span
+        WHERE
+            fr.active
+            AND fr.validate
+            AND fr."state" = 'confirmed'
+            AND fr."id" <> ALL ( %(all_ids)s::INTEGER[] )
+        UNION ALL
+        SELECT
+            a."id",
+            b."id"
+        FROM
+            targets AS a
+            INNER JOIN targets AS b
+                ON a.facility_id = b.facility_id
+                AND a."id" < b."id"
+                AND a.span && b.span
+        ORDER BY
+            1 ASC,
+            2 ASC
+    '''
+
+    @api.model
+    def _count_by(self, group_by, record_ids, domain=None):
+        """ Count, in a single query, the active reservations related with
+        each one of the given records. It is used to maintain the stored
+        reservation counters of the related models.
+
+        Args:
+            group_by (str): many2one field pointing to the related model
+            record_ids (list): ids of the related records
+            domain (list, optional): additional reservation domain
+
+        Returns:
+            dict: ``{record_id: count}``
+        """
+
+        if not record_ids:
+            return {}
+
+        domain = [(group_by, 'in', record_ids)] + (domain or [])
+
+        reservation_obj = self.sudo().with_context(active_test=True)
+        groups = reservation_obj.read_group(domain, [group_by], [group_by])
+
+        count_field = '{}_count'.format(group_by)
+
+        return {group[group_by][0]: group[count_field] for group in groups}
+
+    def _timetable_targets(self):
+        """ Facility weeks shown in the public timetables which include
+        these reservations
+
+        Returns:
+            set: ``(facility_id, date)`` tuples
+        """
+
+        targets = set()
+
+        for record in self:
+            for value in (record.date_start, record.date_stop):
+                if record.facility_id and value:
+                    targets.add((record.facility_id.id, value))
+
+        return targets
+
+    def _invalidate_timetables(self, targets=None):
+        """ Drop the cached public timetables showing these reservations
+
+        Args:
+            targets (set, optional): additional ``(facility_id, date)``
+                tuples, i.e. the ones reservations had before a change
+        """
+
+        targets = set(targets or []) | self._timetable_targets()
+        timetable_cache.invalidate(self.env.cr.dbname, targets)
+
+    def _refresh_timeline(self):
+        """ Refresh the reservation timeline once the current transaction
+        has been committed
+        """
+
+        self.env['facility.reservation.timeline'].schedule_refresh()
+
     def _track_subtype(self, init_values):
         self.ensure_one()
 
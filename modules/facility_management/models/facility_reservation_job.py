@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import models, fields, api
+from odoo.tools.translate import _
+from odoo.exceptions import UserError
+
+from logging import getLogger
+from json import dumps, loads
+from time import perf_counter
+
+
+_logger = getLogger(__name__)
+
+
+class FacilityReservationJob(models.Model):
+    """ Massive reservation action executed in background. Targets are split
+    in chunks, each one is processed and committed in its own transaction by
+    a scheduled action, so a job can be resumed from the last committed
+    chunk after a failure.
+    """
+
+    _name = 'facility.reservation.job'
+    _description = u'Facility reservation job'
+
+    _rec_name = 'name'
+    _order = 'id DESC'
+
+    name = fields.Char(
+        string='Name',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Description of the job',
+        size=255,
+        translate=False
+    )
+
+    action = fields.Selection(
+        string='Action',
+        required=True,
+        readonly=True,
+        index=True,
+        default='update',
+        help='Action will be performed over the targets',
+        selection=[
+            ('update', 'Update reservations'),
+            ('unbind', 'Unbind reservations from scheduler'),
+            ('unlink', 'Remove reservations'),
+            ('schedule', 'Make scheduler reservations')
+        ]
+    )
+
+    state = fields.Selection(
+        string='State',
+        required=True,
+        readonly=True,
+        index=True,
+        default='pending',
+        help='Current job status',
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed')
+        ]
+    )
+
+    user_id = fields.Many2one(
+        string='User',
+        required=True,
+        readonly=True,
+        index=True,
+        default=lambda self: self.env.user,
+        help='User who requested the job, it will be run with their rights',
+        comodel_name='res.users',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    scheduler_id = fields.Many2one(
+        string='Scheduler',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Scheduler which requested the job',
+        comodel_name='facility.reservation.scheduler',
+        domain=[],
+        context={},
+        ondelete='set null',
+        auto_join=False
+    )
+
+    target_ids = fields.Text(
+        string='Targets',
+        required=True,
+        readonly=True,
+        default='[]',
+        help='JSON list with the ids of the target records'
+    )
+
+    values = fields.Text(
+        string='Values',
+        required=False,
+        readonly=True,
+        default='{}',
+        help='JSON dictionary with the values to write'
+    )
+
+    track = fields.Boolean(
+        string='Track',
+        required=False,
+        readonly=True,
+        index=False,
+        default=False,
+        help='If checked, changes will be tracked in each reservation'
+    )
+
+    chunk_size = fields.Integer(
+        string='Chunk size',
+        required=True,
+        readonly=True,
+        index=False,
+        default=500,
+        help='Number of targets processed in each transaction'
+    )
+
+    position = fields.Integer(
+        string='Processed',
+        required=True,
+        readonly=True,
+        index=False,
+        default=0,
+        help='Number of targets already processed and committed'
+    )
+
+    total = fields.Integer(
+        string='Total',
+        required=True,
+        readonly=True,
+        index=False,
+        default=0,
+        help='Number of targets'
+    )
+
+    progress = fields.Float(
+        string='Progress',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0.0,
+        digits=(16, 2),
+        help='Percentage of processed targets',
+        compute='_compute_progress'
+    )
+
+    @api.depends('position', 'total')
+    def _compute_progress(self):
+        for record in self:
+            if record.total:
+                record.progress = record.position * 100.0 / record.total
+            else:
+                record.progress = 100.0 if record.state == 'done' else 0.0
+
+    attempts = fields.Integer(
+        string='Attempts',
+        required=True,
+        readonly=True,
+        index=False,
+        default=0,
+        help='Number of failed attempts of the current chunk'
+    )
+
+    max_attempts = fields.Integer(
+        string='Maximum attempts',
+        required=True,
+        readonly=False,
+        index=False,
+        default=3,
+        help='The job fails after this number of attempts of a chunk'
+    )
+
+    error = fields.Text(
+        string='Error',
+        required=False,
+        readonly=True,
+        translate=False,
+        help='Last error'
+    )
+
+    report = fields.Text(
+        string='Report',
+        required=False,
+        readonly=True,
+        translate=False,
+        help='Result of each processed chunk'
+    )
+
+    date_started = fields.Datetime(
+        string='Started',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Date/time on which the first chunk was processed'
+    )
+
+    date_finished = fields.Datetime(
+        string='Finished',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Date/time on which the job was done or failed'
+    )
+
+    @api.model
+    def enqueue(self, action, target_ids, name, values=None, track=False,
+                scheduler=None, chunk_size=None):
+        """ Create a new job, it will be processed by the scheduled action
+
+        Args:
+            action (str): one of the job actions
+            target_ids (list): reservation ids, or scheduler ids when the
+                action is ``schedule``
+            name (str): description of the job
+            values (dict, optional): values to write in ``update`` jobs
+            track (bool, optional): keep the per-record tracking messages
+            scheduler (models.Model, optional): requesting scheduler
+            chunk_size (int, optional): targets processed in each chunk
+
+        Returns:
+            models.Model: the new job
+        """
+
+        target_ids = list(target_ids or [])
+
+        job_values = {
+            'name': name,
+            'action': action,
+            'target_ids': dumps(target_ids),
+            'values': dumps(values or {}),
+            'track': track,
+            'total': len(target_ids),
+            'scheduler_id': scheduler.id if scheduler else None
+        }
+
+        if chunk_size:
+            job_values['chunk_size'] = chunk_size
+
+        return self.create(job_values)
+
+    def view_job(self):
+        self.ensure_one()
+
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'target': 'current',
+            'name': self.name,
+            'view_mode': 'form'
+        }
+
+    def retry(self):
+        """ Resume failed jobs from the last committed chunk
+        """
+
+        failed_set = self.filtered(lambda record: record.state == 'failed')
+        failed_set.write({
+            'state': 'pending',
+            'attempts': 0,
+            'date_finished': None
+        })
+
+    @api.model
+    def cron_process_jobs(self, limit=None):
+        """ Process the pending jobs, in creation order. Each chunk is
+        committed in its own transaction.
+
+        Args:
+            limit (int, optional): maximum number of jobs to process
+        """
+
+        domain = [('state', 'in', ['pending', 'running'])]
+        job_set = self.search(domain, order='id ASC', limit=limit)
+
+        for job in job_set:
+            job._process()
+
+    def _process(self):
+        self.ensure_one()
+
+        targets = loads(self.target_ids or '[]')
+        size = max(self.chunk_size, 1)
+
+        if not self.date_started:
+            self.date_started = fields.Datetime.now()
+
+        self.state = 'running'
+        self.env.cr.commit()
+
+        while self.position < len(targets):
+            chunk = targets[self.position:self.position + size]
+            started = perf_counter()
+
+            try:
+                with self.env.cr.savepoint():
+                    line = self._process_chunk(chunk)
+                    self.flush()
+
+            except Exception as ex:
+                self.env.clear()
+                self._register_failure(ex)
+                self.env.cr.commit()
+                return False
+
+            line = '{}-{}: {} ({:.3f} s)'.format(
+                self.position + 1, self.position + len(chunk), line,
+                perf_counter() - started)
+
+            self.write({
+                'position': self.position + len(chunk),
+                'attempts': 0,
+                'error': None,
+                'report': '\n'.join(filter(None, [self.report, line]))
+            })
+            self.env.cr.commit()
+
+            msg = 'Job {}: {} of {} targets processed'
+            _logger.info(msg.format(self.id, self.position, len(targets)))
+
+        self._finish(targets)
+        self.env.cr.commit()
+
+        return True
+
+    def _register_failure(self, ex):
+        attempts = self.attempts + 1
+
+        values = {'attempts': attempts, 'error': str(ex)}
+        if attempts >= self.max_attempts:
+            values.update(state='failed', date_finished=fields.Datetime.now())
+
+        self.write(values)
+
+        msg = 'Job {} failed at position {} (attempt {}): {}'
+        _logger.warning(msg.format(self.id, self.position, attempts, ex))
+
+    def _finish(self, targets):
+        if self.action == 'update':
+            reservation_set = self._reservations(targets)
+            reservation_set.mapped('complex_id')._post_bulk_summary(
+                reservation_set,
+                reservation_set._describe_values(loads(self.values or '{}')))
+
+        self.write({
+            'state': 'done',
+            'date_finished': fields.Datetime.now()
+        })
+
+    def _reservations(self, ids):
+        reservation_obj = self.env['facility.reservation']
+        if not self.track:
+            reservation_obj = reservation_obj.with_context(mail_notrack=True)
+
+        return reservation_obj.with_user(self.user_id).browse(ids).exists()
+
+    def _process_chunk(self, ids):
+        """ Perform the job action over the given targets
+
+        Returns:
+            str: chunk report
+        """
+
+        if self.action == 'schedule':
+            scheduler_obj = self.env['facility.reservation.scheduler']
+            scheduler_set = scheduler_obj.with_user(self.user_id).browse(ids)
+
+            lines = []
+            for scheduler in scheduler_set.exists():
+                report = scheduler._make_reservations()
+                lines.append(_(
+                    '{name}: {created} created, {updated} updated, '
+                    '{unchanged} unchanged, {removed} removed and {skipped} '
+                    'skipped'
+                ).format(name=scheduler.display_name, **report))
+
+            return '; '.join(lines)
+
+        reservation_set = self._reservations(ids)
+
+        if self.action == 'update':
+            values = loads(self.values or '{}')
+            reservation_set.bulk_write(
+                values, chunk_size=len(ids), track=self.track, summary=False)
+            result = _('{} reservations updated')
+
+        elif self.action == 'unbind':
+            reservation_set.unbind()
+            result = _('{} reservations unbound')
+
+        elif self.action == 'unlink':
+            reservation_set.unlink()
+            result = _('{} reservations removed')
+
+        else:
+            raise UserError(_('Unknown job action: %s') % self.action)
+
+        return result.format(len(reservation_set))
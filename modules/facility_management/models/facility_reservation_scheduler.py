@@ -6,10 +6,12 @@
 
 from odoo import models, fields, api
 from odoo.tools.translate import _
-from odoo.osv.expression import TRUE_DOMAIN, FALSE_DOMAIN
+from odoo.osv.expression import TRUE_DOMAIN
+from odoo.exceptions import UserError
 from odoo.tools import safe_eval
 
 from logging import getLogger
+from time import perf_counter
 
 _logger = getLogger(__name__)
 
@@ -185,11 +187,11 @@ class FacilityReservationScheduler(models.Model):
         string='Reservation count',
         required=False,
         readonly=True,
-        index=False,
+        index=True,
         default=0,
         help='Number of reservations for this facility',
         compute='_compute_reservation_count',
-        search='_search_reservation_count'
+        store=True
     )
 
     tracking_disable = fields.Boolean(
@@ -201,60 +203,71 @@ class FacilityReservationScheduler(models.Model):
         help='Disable the e-mail notification'
     )
 
-    @api.depends('reservation_ids')
-    def _compute_reservation_count(self):
-        for record in self:
-            record.reservation_count = len(record.reservation_ids)
-
-    @api.model
-    def _search_reservation_count(self, operator, value):
-        domain = FALSE_DOMAIN
-
-        if value is True:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator == '=' else FALSE_DOMAIN
-
-        elif value is False:  # Field is mandatory
-            domain = TRUE_DOMAIN if operator != '=' else FALSE_DOMAIN
-
-        else:
+    skip_conflicts = fields.Boolean(
+        string='Skip conflicts',
+        required=False,
+        readonly=False,
+        index=False,
+        default=False,
+        help=('If checked, the occurrences overlapping other reservations '
+              'will not be reserved instead of cancelling the whole schedule')
+    )
 
-            sql = self._search_reservation_count_sql
+    background = fields.Boolean(
+        string='In background',
+        required=False,
+        readonly=False,
+        index=False,
+        default=False,
+        help=('If checked, reservations will be made or removed by a '
+              'background job instead of waiting for them')
+    )
 
-            self.env.cr.execute(sql.format(operator=operator, value=value))
-            rows = self.env.cr.dictfetchall()
+    job_ids = fields.One2many(
+        string='Jobs',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Background jobs requested from this scheduler',
+        comodel_name='facility.reservation.job',
+        inverse_name='scheduler_id',
+        domain=[],
+        context={},
+        auto_join=False,
+        limit=None
+    )
 
-            if not rows:
-                return FALSE_DOMAIN
+    @api.depends('reservation_ids', 'reservation_ids.active')
+    def _compute_reservation_count(self):
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'scheduler_id', self.filtered('id').ids)
 
-            scheduler_ids = [row['scheduler_id'] for row in (rows or [])]
+        for record in self:
+            record.reservation_count = counts.get(record.id, 0)
 
-            domain = [('id', 'in', scheduler_ids)]
+    confirmed_reservation_count = fields.Integer(
+        string='Confirmed reservations',
+        required=False,
+        readonly=True,
+        index=True,
+        default=0,
+        help='Number of confirmed reservations made by this scheduler',
+        compute='_compute_confirmed_reservation_count',
+        store=True
+    )
 
-        return domain
+    @api.depends('reservation_ids', 'reservation_ids.active',
+                 'reservation_ids.state')
+    def _compute_confirmed_reservation_count(self):
+        reservation_obj = self.env['facility.reservation']
+        counts = reservation_obj._count_by(
+            'scheduler_id', self.filtered('id').ids,
+            [('state', '=', 'confirmed')])
 
-    _search_reservation_count_sql = '''
-        WITH active_reservations AS (
-            SELECT
-                "id" AS reservation_id,
-                scheduler_id
-            FROM
-                facility_reservation
-            WHERE
-                active
-                AND STATE = 'confirmed'
-        )
-         SELECT
-            ars."id" AS scheduler_id
-        FROM
-            facility_reservation_scheduler AS ars
-            LEFT JOIN active_reservations AS ar ON ars."id" = ar.scheduler_id
-        WHERE
-            ars.active
-        GROUP BY
-                ars."id"
-        HAVING
-            COUNT ( ar.facility_id ) {operator} {value}
-    '''
+        for record in self:
+            record.confirmed_reservation_count = counts.get(record.id, 0)
 
     def _uid_is_manager(self):
         technical_group = 'facility_management.facility_group_manager'
@@ -372,60 +385,383 @@ class FacilityReservationScheduler(models.Model):
         if target_set:
             if no_track:
                 context = {'tracking_disable': True}
-                reservation_set = reservation_set.with_context(context)
+                target_set = target_set.with_context(context)
 
             values = {'active': bool(status)}
             target_set.write(values)
 
         return target_set
 
+    @staticmethod
+    def _reservation_differs(reservation, values):
+        """ Check if the reservation has any value, other than its interval,
+        that differs from the given ones.
+
+        Args:
+            reservation (models.Model): single facility.reservation record
+            values (dict): reservation values built by the scheduler
+
+        Returns:
+            bool: True if reservation should be rewritten
+        """
+
+        for field_name, value in values.items():
+            if field_name in ['date_start', 'date_stop']:
+                continue
+
+            current = reservation[field_name]
+            if isinstance(current, models.BaseModel):
+                current = current.id
+
+            if (current or False) != (value or False):
+                return True
+
+        return False
+
+    def _diff_reservations(self, reservation_set, intervals):
+        """ Pair the existing reservations with the desired intervals.
+
+        Reservations already placed in one of the desired intervals are kept
+        as they are, the remaining ones are moved to the free intervals, and
+        then the intervals without reservation will be created and the
+        reservations without interval will be removed.
+
+        Args:
+            reservation_set (models.Model): existing reservations
+            intervals (list): desired ``(date_start, date_stop)`` tuples
+
+        Returns:
+            tuple: ``(kept, moved, to_create, to_remove)`` where ``kept`` and
+            ``to_remove`` are recordsets, ``moved`` is a list of
+            ``(reservation, interval)`` pairs and ``to_create`` is a list of
+            intervals
+        """
+
+        wanted = set(intervals)
+
+        kept_ids, spare = [], []
+        for reservation in reservation_set:
+            interval = (reservation.date_start, reservation.date_stop)
+            if interval in wanted:
+                wanted.discard(interval)
+                kept_ids.append(reservation.id)
+            else:
+                spare.append(reservation)
+
+        missing = [interval for interval in intervals if interval in wanted]
+
+        moved = list(zip(spare, missing))
+        to_create = missing[len(spare):]
+        to_remove = reservation_set.browse([r.id for r in spare[len(missing):]])
+
+        return reservation_set.browse(kept_ids), moved, to_create, to_remove
+
+    def _move_reservations(self, moved):
+        """ Set the new interval of each one of the given reservations. When
+        tracking is disabled all of them are updated in a single statement,
+        otherwise each record is written through the ORM to be tracked.
+
+        Args:
+            moved (list): list of ``(reservation, (date_start, date_stop))``
+        """
+
+        if not moved:
+            return
+
+        if not self.tracking_disable:
+            for reservation, interval in moved:
+                reservation.write({
+                    'date_start': interval[0],
+                    'date_stop': interval[1]
+                })
+            return
+
+        reservation_obj = self.env['facility.reservation']
+        moved_set = reservation_obj.browse(
+            [reservation.id for reservation, interval in moved])
+
+        # As the ORM does for its own raw writes, dependent stored fields
+        # are marked to be recomputed while the old values can still be read
+        moved_fields = ['date_start', 'date_stop', 'write_uid', 'write_date']
+        reservation_obj.flush()
+        moved_set.modified(moved_fields)
+
+        targets = moved_set._timetable_targets()
+
+        params = [
+            self.env.uid,
+            moved_set.ids,
+            [interval[0] for reservation, interval in moved],
+            [interval[1] for reservation, interval in moved]
+        ]
+        self.env.cr.execute(self._move_reservations_sql, params)
+
+        moved_set.invalidate_cache(moved_fields, moved_set.ids)
+        moved_set._invalidate_timetables(targets)
+
+    _move_reservations_sql = '''
+        UPDATE facility_reservation AS fr
+        SET
+            date_start = v.date_start,
+            date_stop = v.date_stop,
+            write_uid = %s,
+            write_date = ( NOW ( ) AT TIME ZONE 'UTC' )
+        FROM
+            unnest ( %s::INTEGER[], %s::TIMESTAMP[], %s::TIMESTAMP[] )
+                AS v ( "id", date_start, date_stop )
+        WHERE
+            fr."id" = v."id"
+    '''
+
+    def _blocking_conflicts(self, intervals):
+        """ Find, in a single query, the reservations which would make the
+        ``unique_facility_id`` constraint fail for the given intervals.
+        Reservations of this scheduler are not taken into account because
+        they will be moved or removed.
+
+        Args:
+            intervals (list): ``(date_start, date_stop)`` tuples
+
+        Returns:
+            list: ``(position, reservation_id)`` tuples, where ``position``
+            is the index of the interval in the given list
+        """
+
+        self.ensure_one()
+
+        if not intervals or not (self.validate and self.confirm):
+            return []
+
+        reservation_obj = self.env['facility.reservation']
+        reservation_obj.flush([
+            'facility_id', 'date_start', 'date_stop', 'active', 'validate',
+            'state', 'scheduler_id'
+        ])
+
+        params = [
+            [interval[0] for interval in intervals],
+            [interval[1] for interval in intervals],
+            self.facility_id.id,
+            self.id
+        ]
+        self.env.cr.execute(self._blocking_conflicts_sql, params)
+
+        return [(row[0] - 1, row[1]) for row in self.env.cr.fetchall()]
+
+    _blocking_conflicts_sql = '''
+        WITH occurrences AS (
+            SELECT
+                o.position,
+                tsrange ( o.date_start, o.date_stop ) AS span
+            FROM
+                unnest ( %s::TIMESTAMP[], %s::TIMESTAMP[] )
+                    WITH ORDINALITY AS o ( date_start, date_stop, position )
+        )
+        SELECT
+            o.position,
+            fr."id" AS reservation_id
+        FROM
+            occurrences AS o
+            INNER JOIN facility_reservation AS fr
+                ON tsrange ( fr.date_start, fr.date_stop ) && o.span
+        WHERE
+            fr.facility_id = %s
+            AND fr.active
+            AND fr.validate
+            AND fr.state = 'confirmed'
+            AND fr.scheduler_id IS DISTINCT FROM %s
+        ORDER BY
+            o.position ASC,
+            fr.date_start ASC,
+            fr."id" ASC
+    '''
+
+    def _scheduled_intervals(self):
+        """ Scheduled intervals without microseconds, ORM datetimes have
+        not them and they would prevent matching existing reservations.
+        """
+
+        return [
+            (start.replace(microsecond=0), stop.replace(microsecond=0))
+            for start, stop in self.scheduled_intervals()
+        ]
+
+    def compute_conflicts(self):
+        """ Dry-run the scheduler, nothing is written. All the occurrences
+        are checked against the existing reservations in a single query.
+
+        Returns:
+            list: one dictionary by conflict, ordered by occurrence, with the
+            keys ``date``, ``date_start``, ``date_stop``, ``reservation_id``,
+            ``reservation``, ``owner_id`` and ``owner``
+        """
+
+        self.ensure_one()
+
+        intervals = self._scheduled_intervals()
+        conflicts = self._blocking_conflicts(intervals)
+
+        reservation_obj = self.env['facility.reservation']
+        reservation_set = reservation_obj.browse(
+            [reservation_id for position, reservation_id in conflicts])
+
+        result = []
+        for position, reservation_id in conflicts:
+            date_start, date_stop = intervals[position]
+            reservation = reservation_set.browse(reservation_id)
+            local_start = fields.Datetime.context_timestamp(self, date_start)
+
+            result.append({
+                'date': local_start.date(),
+                'date_start': date_start,
+                'date_stop': date_stop,
+                'reservation_id': reservation.id,
+                'reservation': reservation.display_name,
+                'owner_id': reservation.owner_id.id,
+                'owner': reservation.owner_id.name
+            })
+
+        return result
+
+    def check_conflicts(self):
+        """ Show the conflicts that prevent making the reservations. When
+        there are none the user is notified, without an error dialog and
+        without rolling back the transaction.
+        """
+
+        lines = []
+        for record in self:
+            for conflict in record.compute_conflicts():
+                lines.append(_('{date}: {reservation} ({owner})').format(
+                    date=fields.Date.to_string(conflict['date']),
+                    reservation=conflict['reservation'],
+                    owner=conflict['owner'] or _('Unknown')
+                ))
+
+        if not lines:
+            self._notify_user(_('No conflicts were found'))
+            return True
+
+        message = _('The following reservations overlap the schedule:')
+        raise UserError('\n'.join([message] + lines))
+
+    def _notify_user(self, message, title=None):
+        """ Show a notification to the current user in the web client
+        """
+
+        channel = (self.env.cr.dbname, 'res.partner',
+                   self.env.user.partner_id.id)
+
+        self.env['bus.bus'].sendone(channel, {
+            'type': 'simple_notification',
+            'title': title or _('Reservation scheduler'),
+            'message': message,
+            'sticky': False,
+            'warning': False
+        })
+
     def _make_reservations(self):
-        """ Compute the intervals and either create new reservations or update
-        existing ones accordingly. Excess reservations are unlinked.
+        """ Compute the intervals and synchronize the related reservations
+        with them in bulk:
+
+        1. Reservations without interval are unlinked at once.
+        2. Reservations in a wrong interval are moved in a single statement.
+        3. Reservations with outdated values are written at once.
+        4. Missing reservations are created in a single ``create`` call.
+
+        Reservations already matching an interval and the scheduler values
+        are not rewritten. If ``skip_conflicts`` is checked, the occurrences
+        overlapping other reservations are left out beforehand.
+
+        Returns:
+            dict: number of ``created``, ``updated``, ``unchanged``,
+            ``removed`` and ``skipped`` reservations and ``elapsed`` time in
+            seconds
         """
 
         self.ensure_one()
 
-        if self.repeat:
-            dates = self._compute_repetition_dates()
-        else:
-            dates = [self.date_base]
+        started = perf_counter()
+
+        intervals = self._scheduled_intervals()
+
+        skipped = 0
+        if self.skip_conflicts:
+            conflicts = self._blocking_conflicts(intervals)
+            positions = set(position for position, _id in conflicts)
+            intervals = [
+                interval for index, interval in enumerate(intervals)
+                if index not in positions
+            ]
+            skipped = len(positions)
 
         defaults = self._build_reservation_values()
 
         reservation_set = self._search_related_reservation()
+        kept_set, moved, to_create, to_remove = \
+            self._diff_reservations(reservation_set, intervals)
+
+        moved_set = reservation_set.browse(
+            [reservation.id for reservation, interval in moved])
+
+        stale_set = (kept_set | moved_set).filtered(
+            lambda r: self._reservation_differs(r, defaults))
+
+        common = {
+            key: value for key, value in defaults.items()
+            if key not in ['date_start', 'date_stop']
+        }
 
         with self.env.cr.savepoint():
-            changed_set = self._toggle_reservation_status(
-                reservation_set, False)
+            if to_remove:
+                to_remove.unlink()
+
+            changed_set = self._toggle_reservation_status(moved_set, False)
 
-            index, length = 0, len(reservation_set)
-            for dt in dates:
+            self._move_reservations(moved)
 
-                date_start, date_stop = self.compute_interval(dt)
+            if stale_set:
+                stale_set.write(common)
+
+            self._toggle_reservation_status(changed_set, True)
+
+            values_list = []
+            for date_start, date_stop in to_create:
                 values = defaults.copy()
                 values.update({
                     'date_start': date_start,
                     'date_stop': date_stop
                 })
+                values_list.append(values)
+
+            if values_list:
+                reservation_set.create(values_list)
+
+        report = {
+            'created': len(to_create),
+            'updated': len(stale_set | moved_set),
+            'unchanged': len(kept_set - stale_set),
+            'removed': len(to_remove),
+            'skipped': skipped,
+            'elapsed': perf_counter() - started
+        }
 
-                if index < length:
-                    reservation_set[index].write(values)
-                    index = index + 1
-                else:
-                    reservation_set.create(values)
-
-            if index < length:
-                reservation_set[index:].unlink()
+        msg = ('Scheduler {id}: {created} created, {updated} updated, '
+               '{unchanged} unchanged, {removed} removed and {skipped} '
+               'skipped reservations in {elapsed:.3f} seconds')
+        _logger.info(msg.format(id=self.id, **report))
 
-            self._toggle_reservation_status(changed_set.exists(), True)
+        return report
 
     def make_reservations(self):
         """ Create or update reservations from the current scheduler.
         """
 
         for record in self:
-            record._make_reservations()
+            if record.background:
+                record._enqueue_job('schedule', record.ids)
+            else:
+                record._make_reservations()
 
         return self._sertialize_reservation_act(target='main')
 
@@ -433,6 +769,11 @@ class FacilityReservationScheduler(models.Model):
         removed_ids = []
 
         for record in self:
+            if record.background:
+                reservation_set = record._search_related_reservation()
+                record._enqueue_job('unlink', reservation_set.ids)
+                continue
+
             today = fields.Date.context_today(record)
             today = fields.Date.to_string(today)
 
@@ -443,6 +784,23 @@ class FacilityReservationScheduler(models.Model):
 
         return self._sertialize_reservation_act(target='main')
 
+    def _enqueue_job(self, action, target_ids):
+        """ Request a background job for this scheduler, it will be shown in
+        the scheduler form along with its progress and report.
+        """
+
+        self.ensure_one()
+
+        job_obj = self.env['facility.reservation.job']
+        selection = dict(job_obj._fields['action']._description_selection(
+            self.env))
+
+        name = '{}: {}'.format(selection.get(action), self.display_name)
+
+        return job_obj.enqueue(
+            action, target_ids, name, track=not self.tracking_disable,
+            scheduler=self, chunk_size=1 if action == 'schedule' else None)
+
     def _sertialize_reservation_act(self, target=None):
         action_xid = 'facility_management.action_reservations_act_window'
         act_wnd = self.env.ref(action_xid)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import models, fields
+
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+class FacilityReservationTimeline(models.Model):
+    """ Denormalized timeline of the active reservations. Each row joins a
+    reservation with its facility, complex and company, and includes the
+    time range and the day on which it starts in the complex timezone.
+
+    It is stored as a table maintained from a change log, so it has to be
+    used only to read committed data. The rows of the changed reservations
+    are recomputed after each transaction, changes in facilities and
+    complexes lead to a full refresh by the scheduled action. It feeds the
+    reservation dashboards and the occupancy report; readers which cannot
+    afford this lag, like the cached timetables and the timetable report,
+    have to read the reservations instead.
+    """
+
+    _name = 'facility.reservation.timeline'
+    _description = u'Facility reservation timeline'
+
+    _inherit = ['materialized.view.abstract']
+
+    _rec_name = 'reservation_id'
+    _order = 'date_start ASC, date_stop ASC, id ASC'
+
+    _auto = False
+
+    _source_tables = [
+        'facility_reservation',
+        'facility_facility',
+        'facility_complex'
+    ]
+
+    # Only the columns read by ``_view_sql``, the facility and complex
+    # counters are updated on most reservation writes
+    _source_columns = {
+        'facility_facility': ['complex_id', 'company_id', 'type_id'],
+        'facility_complex': [
+            'partner_id', 'company_id', 'owner_id', 'subrogate_id'
+        ]
+    }
+
+    _natural_key = ['reservation_id']
+
+    _storage = 'table'
+
+    _delta_key = 'reservation_id'
+
+    _delta_sources = {'facility_reservation': 'id'}
+
+    _unique_key = ['id']
+
+    _indexes = {
+        'span': {
+            'columns': ['facility_id', 'span'],
+            'using': 'gist'  # Requires btree_gist
+        },
+        'start': {'columns': ['facility_id', 'date_start']},
+        'stop': {'columns': ['facility_id', 'date_stop']},
+        'day': {'columns': ['complex_id', 'local_date', 'state']},
+        'requested': {
+            'columns': ['complex_id', 'date_start'],
+            'where': "\"state\" = 'requested'"
+        }
+    }
+
+    reservation_id = fields.Many2one(
+        string='Reservation',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Reservation to which the row belongs',
+        comodel_name='facility.reservation',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    facility_id = fields.Many2one(
+        string='Facility',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Reserved facility',
+        comodel_name='facility.facility',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    complex_id = fields.Many2one(
+        string='Complex',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Complex to which the facility belongs',
+        comodel_name='facility.complex',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    company_id = fields.Many2one(
+        string='Company',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Company to which the facility belongs',
+        comodel_name='res.company',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    type_id = fields.Many2one(
+        string='Type',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Type of the reserved facility',
+        comodel_name='facility.type',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    owner_id = fields.Many2one(
+        string='Owner',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='User who owns the reservation',
+        comodel_name='res.users',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    state = fields.Selection(
+        string='State',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Reservation status',
+        selection=[
+            ('requested', 'Requested'),
+            ('confirmed', 'Confirmed'),
+            ('rejected', 'Rejected')
+        ]
+    )
+
+    date_start = fields.Datetime(
+        string='Beginning',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Date/time of reservation start'
+    )
+
+    date_stop = fields.Datetime(
+        string='Ending',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Date/time of reservation end'
+    )
+
+    date_delay = fields.Float(
+        string='Duration',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0.0,
+        digits=(16, 2),
+        help='Reserved hours',
+        group_operator='sum'
+    )
+
+    local_date = fields.Date(
+        string='Day',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Day on which the reservation starts, in the complex timezone'
+    )
+
+    tz = fields.Char(
+        string='Timezone',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Timezone of the complex',
+        size=64,
+        translate=False
+    )
+
+    # The row id will be the reservation id, see ``_natural_key``
+    _view_sql = '''
+        SELECT
+            fr."id" AS reservation_id,
+            fr.facility_id,
+            ff.complex_id,
+            ff.company_id,
+            ff.type_id,
+            fr.owner_id,
+            fr."state",
+            fr.date_start,
+            fr.date_stop,
+            tsrange ( fr.date_start, fr.date_stop ) AS span,
+            EXTRACT (
+                epoch FROM fr.date_stop - fr.date_start
+            ) / 3600.0 AS date_delay,
+            tz."name" AS tz,
+            timezone (
+                tz."name", fr.date_start AT TIME ZONE 'UTC'
+            )::DATE AS local_date,
+            fr.create_uid,
+            fr.create_date,
+            fr.write_uid,
+            fr.write_date
+        FROM
+            facility_reservation AS fr
+            INNER JOIN facility_facility AS ff ON ff."id" = fr.facility_id
+            LEFT JOIN facility_complex AS fc ON fc."id" = ff.complex_id
+            LEFT JOIN res_partner AS cp ON cp."id" = fc.partner_id
+            LEFT JOIN res_company AS rc ON rc."id" = fc.company_id
+            LEFT JOIN res_partner AS rcp ON rcp."id" = rc.partner_id
+            LEFT JOIN res_users AS ru
+                ON ru."id" = COALESCE ( fc.subrogate_id, fc.owner_id )
+            LEFT JOIN res_partner AS rup ON rup."id" = ru.partner_id
+            CROSS JOIN LATERAL (
+                SELECT
+                    COALESCE (
+                        NULLIF ( cp.tz, '' ),
+                        NULLIF ( rcp.tz, '' ),
+                        NULLIF ( rup.tz, '' ),
+                        'UTC'
+                    ) AS "name"
+            ) AS tz
+        WHERE
+            fr.active
+    '''
@@ -8,11 +8,15 @@ from odoo import models, fields, api
 from odoo.tools.translate import _
 from odoo.exceptions import ValidationError, UserError
 from odoo.osv.expression import OR
+from odoo.addons.facility_management.utils.recurrence_utils import \
+    RecurrenceRule, expand_dates, next_date
+from odoo.addons.facility_management.utils.timezone_utils import \
+    utc_offset, from_utc, to_utc_datetimes
 
 from logging import getLogger
 from datetime import date, datetime, timedelta, time
 from dateutil.relativedelta import relativedelta
-from pytz import timezone, utc
+from pytz import utc
 from num2words import num2words
 from math import ceil, floor
 
@@ -94,9 +98,7 @@ class FaicilitySchedulerMixin(models.AbstractModel):
     def default_time_start(self):
         now = datetime.now()
 
-        tz = self.env.user.tz or utc.zone
-        tz = timezone(tz)
-        now_tz = tz.fromutc(now)
+        now_tz = from_utc(self._get_tz_name(), now)
 
         return float(now_tz.hour)
 
@@ -204,11 +206,10 @@ class FaicilitySchedulerMixin(models.AbstractModel):
             if record.full_day:
                 record.date_delay = 24.0
             else:
-                start = record.join_datetime(
-                    record.date_base, record.time_start, day_limit=True)
-
-                stop = record.join_datetime(
-                    record.date_base, record.time_stop, day_limit=True)
+                start, stop = to_utc_datetimes(record._get_tz_name(), [
+                    (record.date_base or date.min, record.time_start),
+                    (record.date_base or date.min, record.time_stop)
+                ], day_limit=True)
 
                 record.date_delay = self._float_interval(start, stop)
 
@@ -553,54 +554,62 @@ class FaicilitySchedulerMixin(models.AbstractModel):
 
         return index + 1
 
-    def _next_repetition_date(self, date_cursor):
-        interval = self.interval_number
+    def _recurrence_snapshot(self):
+        """ Freeze the scheduler values that define the recurrence. The
+        result is hashable and it is used as key to memoize the expansion.
 
-        if self.interval_type == 'year':
-            result = date_cursor + relativedelta(years=interval)
+        Returns:
+            RecurrenceRule: frozen scheduler values
+        """
 
-        elif self.interval_type == 'month':
-            if self.month_type == 'month':
-                result = date_cursor + relativedelta(months=interval)
-            else:
-                result = self._week_day_position(date_cursor, months=interval)
+        self.ensure_one()
 
-        elif self.interval_type == 'week':
-            result = date_cursor + timedelta(days=1)
+        sequences = set(self.mapped('weekday_ids.sequence'))
 
-            while not self._match_weekday(result):
-                result += timedelta(days=1)
-        else:
-            result = date_cursor + timedelta(days=interval)
+        return RecurrenceRule(
+            date_base=self.date_base,
+            repeat=bool(self.repeat),
+            interval_type=self.interval_type,
+            interval_number=self.interval_number,
+            weekdays=tuple(sorted(sequences)),
+            month_type=self.month_type,
+            finish_type=self.finish_type,
+            finish_date=self.finish_date,
+            finish_number=self.finish_number
+        )
 
-        return result
+    def _next_repetition_date(self, date_cursor):
+        self.ensure_one()
 
-    def _reached_last_repetition_date(self, dates, date_cursor):
-        if self.finish_type == 'number':
-            return len(dates) >= self.finish_number
-        else:  # date
-            return date_cursor > self.finish_date
+        if not date_cursor:
+            return None
 
-    def _compute_repetition_dates(self):
-        self.ensure_one()
+        rule = self._recurrence_snapshot()
 
-        loop_index = 0
+        return next_date(rule, date_cursor)
 
-        date_cursor = self.date_base
-        dates = []
+    def _compute_repetition_dates(self, limit=1024):
+        """ Expand the recurrence. The expansion is memoized by snapshot, so
+        it will be shared by all methods working with the same values.
 
-        while not self._reached_last_repetition_date(dates, date_cursor):
+        Args:
+            limit (int, optional): maximum number of allowed dates
 
-            loop_index = self._loop_security_break(loop_index)
+        Returns:
+            list: a list of dates (whithout time)
 
-            # Check match for weekday if applicable before append new date
-            if self.interval_type != 'week' or \
-               self._match_weekday(date_cursor):
-                dates.append(date_cursor)
+        Raises:
+            UserError: if expansion exceeds the given limit
+        """
 
-            date_cursor = self._next_repetition_date(date_cursor)
+        self.ensure_one()
+
+        rule = self._recurrence_snapshot()._replace(repeat=True)
+        dates = expand_dates(rule, limit)
 
-        return dates
+        self._loop_security_break(len(dates) - 1, limit)
+
+        return list(dates)
 
     def _overlapped_domain(self, f1, f2, v1, v2, inverse=False):
         """ Create a valid Odoo domain to search reservations whose time
@@ -636,11 +645,13 @@ class FaicilitySchedulerMixin(models.AbstractModel):
 
         return [op1, (f1, op2, v2), (f2, op3, v1)]
 
+    @api.model
+    def _get_tz_name(self):
+        return self.env.user.tz or utc.zone
+
     @api.model
     def _get_timezone_offset(self, dt):
-        tz = self.env.user.tz or utc.zone
-        tz = timezone(tz)
-        return tz.fromutc(dt).utcoffset()
+        return utc_offset(self._get_tz_name(), dt)
 
     @api.model
     def join_datetime(self, dt, tm=0.0, day_limit=False):
@@ -656,20 +667,10 @@ class FaicilitySchedulerMixin(models.AbstractModel):
             datetime: joined datetime value
         """
 
-        zero_time = datetime.min.time()
-
         dt = dt or date.min
-        tm = tm or 0.0
-
-        if day_limit:
-            tm = min(tm, 24)
+        pairs = [(dt, tm)]
 
-        base = datetime.combine(dt, zero_time)
-        offset = timedelta(seconds=tm * 3600.0)
-
-        tz_offset = self._get_timezone_offset(base)
-
-        return base + offset - tz_offset
+        return to_utc_datetimes(self._get_tz_name(), pairs, day_limit)[0]
 
     @api.model
     def split_datetime(self, dt):
@@ -708,6 +709,42 @@ class FaicilitySchedulerMixin(models.AbstractModel):
         else:
             return [self.date_base]
 
+    def scheduled_intervals(self):
+        """ Return the time intervals, in UTC, resulting from the criteria of
+        the scheduler.
+
+        Returns:
+            list: a list of ``(date_start, date_stop)`` tuples
+        """
+
+        self.ensure_one()
+
+        return self._compute_intervals(self.scheduled_dates())
+
+    def _compute_intervals(self, dates):
+        """ Combine each one of the given dates with ``time_start`` and with
+        ``time_stop``, all of them are converted to UTC in a single call.
+
+        Args:
+            dates (list): dates to combine
+
+        Returns:
+            list: a list of ``(date_start, date_stop)`` tuples
+        """
+
+        self.ensure_one()
+
+        time_start = 0.0 if self.full_day else self.time_start
+        time_stop = 24.0 if self.full_day else self.time_stop
+
+        pairs = []
+        for dt in dates:
+            pairs.extend([(dt, time_start), (dt, time_stop)])
+
+        values = to_utc_datetimes(self._get_tz_name(), pairs, day_limit=True)
+
+        return list(zip(values[0::2], values[1::2]))
+
     def matching_reservations(self, not_confirmed=False):
         """ Search for reservations search for reservations that match the
         dates of the schedule.
@@ -723,16 +760,10 @@ class FaicilitySchedulerMixin(models.AbstractModel):
 
         self.ensure_one()
 
-        dates = self.scheduled_dates()
-
-        time_start = 0.0 if self.full_day else self.time_start
-        time_stop = 24.0 if self.full_day else self.time_stop
+        intervals = self.scheduled_intervals()
 
         domains = [('state', '<>', 'rejected')] if not_confirmed else []
-        for dt in dates:
-            v1 = self.join_datetime(dt, time_start, day_limit=True)
-            v2 = self.join_datetime(dt, time_stop, day_limit=True)
-
+        for v1, v2 in intervals:
             v1 = v1.strftime('%Y-%m-%d %H:%M:%S')
             v2 = v2.strftime('%Y-%m-%d %H:%M:%S')
 
@@ -858,9 +889,4 @@ class FaicilitySchedulerMixin(models.AbstractModel):
 
         self.ensure_one()
 
-        time_start = 0.0 if self.full_day else self.time_start
-        time_stop = 24.0 if self.full_day else self.time_stop
-        date_start = self.join_datetime(dt, time_start, day_limit=True)
-        date_stop = self.join_datetime(dt, time_stop, day_limit=True)
-
-        return date_start, date_stop
+        return self._compute_intervals([dt])[0]
@@ -5,4 +5,5 @@
 ###############################################################################
 
 from . import time_span_report_mixin
-from . import facility_report
\ No newline at end of file
+from . import facility_report
+from . import facility_occupancy_report
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import models, fields
+
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+class FacilityOccupancyReport(models.Model):
+    """ Daily occupancy of each facility, to be used in pivot and graph views.
+    There is a row for every day of each facility, from its first to its last
+    reserved day, so grouped averages also take into account the days on
+    which the facility was not reserved.
+
+    It is built from the reservation timeline and stored as a table, the rows
+    of a facility are recomputed when its timeline rows or the facility
+    change, so reading the report does not expand the days again.
+    """
+
+    _name = 'facility.occupancy.report'
+    _description = u'Facility occupancy report'
+
+    _inherit = ['materialized.view.abstract']
+
+    _rec_name = 'facility_id'
+    _order = 'date DESC, facility_id ASC'
+
+    _auto = False
+
+    _source_tables = ['facility_reservation_timeline', 'facility_facility']
+
+    _source_columns = {
+        'facility_facility': ['complex_id', 'type_id', 'company_id']
+    }
+
+    _natural_key = ['facility_id', 'date']
+
+    _storage = 'table'
+
+    _delta_key = 'facility_id'
+
+    _delta_sources = {
+        'facility_reservation_timeline': 'facility_id',
+        'facility_facility': 'id'
+    }
+
+    _indexes = {
+        'facility': {'columns': ['facility_id', 'date']},
+        'date': {'columns': ['date']}
+    }
+
+    date = fields.Date(
+        string='Date',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Day (UTC) in which the facility is occupied'
+    )
+
+    facility_id = fields.Many2one(
+        string='Facility',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Occupied facility',
+        comodel_name='facility.facility',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    complex_id = fields.Many2one(
+        string='Complex',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Complex to which the facility belongs',
+        comodel_name='facility.complex',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    type_id = fields.Many2one(
+        string='Type',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Type of facility',
+        comodel_name='facility.type',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    company_id = fields.Many2one(
+        string='Company',
+        required=False,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Company to which the facility belongs',
+        comodel_name='res.company',
+        domain=[],
+        context={},
+        ondelete='cascade',
+        auto_join=False
+    )
+
+    occupied_hours = fields.Float(
+        string='Occupied hours',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0.0,
+        digits=(16, 2),
+        help='Hours of the day in which the facility is reserved',
+        group_operator='sum'
+    )
+
+    available_hours = fields.Float(
+        string='Available hours',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0.0,
+        digits=(16, 2),
+        help=('Hours of the day in which the facility could be reserved. '
+              'Facilities have no opening hours, so all the day is '
+              'considered available'),
+        group_operator='sum'
+    )
+
+    occupancy = fields.Float(
+        string='Occupancy (%)',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0.0,
+        digits=(16, 2),
+        help=('Percentage of the available hours in which the facility '
+              'is reserved'),
+        group_operator='avg'
+    )
+
+    reservation_count = fields.Integer(
+        string='Reservations',
+        required=False,
+        readonly=True,
+        index=False,
+        default=0,
+        help='Number of reservations which occupy the facility in the day',
+        group_operator='sum'
+    )
+
+    # Days are bounded by the reservations of each facility, so conditions
+    # on ``facility_id`` are pushed down into the timeline scans
+    _view_sql = '''
+        SELECT
+            b.facility_id,
+            dy.bucket::DATE AS "date",
+            ff.complex_id,
+            ff.type_id,
+            ff.company_id,
+            COALESCE ( d.occupied_hours, 0.0 ) AS occupied_hours,
+            24.0 AS available_hours,
+            COALESCE ( d.occupied_hours, 0.0 ) * 100.0 / 24.0 AS occupancy,
+            COALESCE ( d.reservation_count, 0 ) AS reservation_count
+        FROM
+            (
+                SELECT
+                    fr.facility_id,
+                    MIN ( fr.date_start )::DATE AS first_date,
+                    ( MAX ( fr.date_stop ) - '1 microsecond'::INTERVAL )::DATE
+                        AS last_date
+                FROM
+                    facility_reservation_timeline AS fr
+                WHERE
+                    fr."state" = 'confirmed'
+                    AND fr.date_stop > fr.date_start
+                GROUP BY
+                    fr.facility_id
+            ) AS b
+            INNER JOIN facility_facility AS ff ON ff."id" = b.facility_id
+            CROSS JOIN LATERAL generate_series (
+                b.first_date::TIMESTAMP,
+                b.last_date::TIMESTAMP,
+                '1 day'::INTERVAL
+            ) AS dy ( bucket )
+            LEFT JOIN (
+                SELECT
+                    fr.facility_id,
+                    bk.bucket::DATE AS "date",
+                    SUM (
+                        EXTRACT (
+                            epoch FROM UPPER ( i.span ) - LOWER ( i.span )
+                        )
+                    ) / 3600.0 AS occupied_hours,
+                    COUNT ( DISTINCT fr."id" ) AS reservation_count
+                FROM
+                    facility_reservation_timeline AS fr
+                    CROSS JOIN LATERAL generate_series (
+                        date_trunc ( 'day', fr.date_start ),
+                        fr.date_stop,
+                        '1 day'::INTERVAL
+                    ) AS bk ( bucket )
+                    CROSS JOIN LATERAL (
+                        SELECT
+                            fr.span * tsrange (
+                                bk.bucket, bk.bucket + '1 day'::INTERVAL
+                            ) AS span
+                    ) AS i
+                WHERE
+                    fr."state" = 'confirmed'
+                    AND NOT isempty ( i.span )
+                GROUP BY
+                    fr.facility_id,
+                    bk.bucket
+            ) AS d ON d.facility_id = b.facility_id
+                AND d."date" = dy.bucket::DATE
+    '''
@@ -6,10 +6,11 @@
 
 from odoo import models, fields, api
 from odoo.tools.translate import _
+from odoo.addons.facility_management.utils.timezone_utils import utc_offset
 
 from logging import getLogger
-from datetime import timedelta, datetime
-from pytz import timezone, utc
+from datetime import timedelta
+from pytz import utc
 
 _logger = getLogger(__name__)
 
@@ -124,6 +125,53 @@ class TimeSpanReportMixin(models.AbstractModel):
 
         return begin or finish
 
+    @staticmethod
+    def _range_domain(days, field_start='date_start', field_stop='date_stop'):
+        """ Domain for the records which start or finish inside the given
+        day range, this is the set-based counterpart of ``_in``.
+
+        Args:
+            days (list): consecutive days as returned by ``_date_range``
+            field_start (str, optional): name of the field with the start
+            field_stop (str, optional): name of the field with the stop
+
+        Returns:
+            list: valid Odoo domain
+        """
+
+        lower = fields.Datetime.to_string(days[0])
+        upper = fields.Datetime.to_string(days[-1] + timedelta(days=1))
+
+        return [
+            '|',
+            '&', (field_start, '>=', lower), (field_start, '<', upper),
+            '&', (field_stop, '>=', lower), (field_stop, '<', upper)
+        ]
+
+    @staticmethod
+    def _day_indexes(days, reservation):
+        """ Positions, in the given day range, of the days in which the
+        reservation starts or finishes. It matches ``_in`` without having to
+        check every day.
+
+        Args:
+            days (list): consecutive days as returned by ``_date_range``
+            reservation (models.Model): record with date_start and date_stop
+
+        Returns:
+            list: sorted indexes of the matching days
+        """
+
+        one_day = timedelta(days=1)
+        indexes = set()
+
+        for value in (reservation.date_start, reservation.date_stop):
+            index = (value - days[0]) // one_day
+            if 0 <= index < len(days):
+                indexes.add(index)
+
+        return sorted(indexes)
+
     @staticmethod
     def _week_day(target_date):
         return int(target_date.weekday())
@@ -154,10 +202,11 @@ class TimeSpanReportMixin(models.AbstractModel):
 
     @api.model
     def time_str(self, reservation):
-        tz_offset = self._get_timezone_offset(datetime.now())
+        start = reservation.date_start
+        start = start + self._get_timezone_offset(start)
 
-        start = reservation.date_start + tz_offset
-        stop = reservation.date_stop + tz_offset
+        stop = reservation.date_stop
+        stop = stop + self._get_timezone_offset(stop)
 
         start = start.strftime('%H:%M')
         stop = stop.strftime('%H:%M')
@@ -179,6 +228,4 @@ class TimeSpanReportMixin(models.AbstractModel):
 
     @api.model
     def _get_timezone_offset(self, dt):
-        tz = self.env.user.tz or utc.zone
-        tz = timezone(tz)
-        return tz.fromutc(dt).utcoffset()
+        return utc_offset(self.env.user.tz or utc.zone, dt)
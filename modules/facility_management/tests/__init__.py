@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from . import test_timezone_utils
+from . import test_facility_timetable
+from . import test_facility_reservation_timeline
+from . import test_facility_next_use
+from . import test_facility_occupancy_report
+from . import test_facility_conflict_count
+from . import test_reservation_counters
+from . import test_facility_available
+from . import test_facility_reservation
+from . import test_facility_complex_reservation_rel
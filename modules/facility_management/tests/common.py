@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.tests.common import TransactionCase, HttpCase
+
+from datetime import datetime
+
+
+class FacilityDataMixin(object):
+    """ Complex, facilities and reservations shared by the test cases. The
+    reservations are placed in 2030 so they never match demo data.
+    """
+
+    def _setup_facility_data(self):
+        self.type = self.env['facility.type'].create({
+            'name': 'Test type'
+        })
+
+        self.complex = self._complex('Test complex', 'TSTCPX')
+
+        self.facility = self._facility('Test facility A', 'TSTFA')
+        self.other_facility = self._facility('Test facility B', 'TSTFB')
+
+    def _complex(self, name, code):
+        return self.env['facility.complex'].create({
+            'name': name,
+            'code': code,
+            'company_id': self.env.ref('base.main_company').id,
+            'owner_id': self.env.ref('base.user_admin').id
+        })
+
+    def _facility(self, name, code, complex_record=None):
+        return self.env['facility.facility'].create({
+            'name': name,
+            'code': code,
+            'type_id': self.type.id,
+            'complex_id': (complex_record or self.complex).id,
+            'users': 10,
+            'excess': 10
+        })
+
+    def _reservation(self, facility, date_start, date_stop,
+                     state='confirmed', validate=True, **values):
+        values.update({
+            'name': 'Test reservation',
+            'facility_id': facility.id,
+            'date_start': date_start,
+            'date_stop': date_stop,
+            'state': state,
+            'validate': validate
+        })
+
+        return self.env['facility.reservation'].create(values)
+
+    @staticmethod
+    def _dt(*args):
+        return datetime(*args)
+
+
+class FacilityTestCase(FacilityDataMixin, TransactionCase):
+
+    def setUp(self):
+        super(FacilityTestCase, self).setUp()
+        self._setup_facility_data()
+
+
+class FacilityHttpCase(FacilityDataMixin, HttpCase):
+
+    def setUp(self):
+        super(FacilityHttpCase, self).setUp()
+        self._setup_facility_data()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityAvailable(FacilityTestCase):
+    """ Only active, validated and confirmed reservations, the ones checked
+    by the exclusion constraint, make a facility unavailable
+    """
+
+    def setUp(self):
+        super(TestFacilityAvailable, self).setUp()
+
+        self.facility_obj = self.env['facility.facility']
+
+        self._reservation(self.facility, self._dt(2030, 1, 8, 10, 0),
+                          self._dt(2030, 1, 8, 12, 0))
+
+    def _available(self, date_start, date_stop, **kwargs):
+        kwargs.setdefault('complex_ids', self.complex)
+
+        return self.facility_obj.available(date_start, date_stop, **kwargs)
+
+    def test_overlap(self):
+        facility_set = self._available(
+            self._dt(2030, 1, 8, 11, 0), self._dt(2030, 1, 8, 13, 0))
+
+        self.assertEqual(facility_set, self.other_facility)
+
+    def test_contiguous_intervals(self):
+        before = self._available(
+            self._dt(2030, 1, 8, 9, 0), self._dt(2030, 1, 8, 10, 0))
+        after = self._available(
+            self._dt(2030, 1, 8, 12, 0), self._dt(2030, 1, 8, 13, 0))
+
+        facility_set = self.facility | self.other_facility
+        self.assertEqual(before, facility_set)
+        self.assertEqual(after, facility_set)
+
+    def test_non_blocking_reservations(self):
+        date_start = self._dt(2030, 1, 9, 10, 0)
+        date_stop = self._dt(2030, 1, 9, 12, 0)
+
+        self._reservation(self.facility, date_start, date_stop,
+                          state='requested')
+        self._reservation(self.facility, date_start, date_stop,
+                          validate=False)
+        self._reservation(self.facility, date_start, date_stop,
+                          active=False)
+
+        facility_set = self._available(date_start, date_stop)
+
+        self.assertEqual(facility_set, self.facility | self.other_facility)
+
+    def test_filters(self):
+        date_start = self._dt(2030, 1, 9, 10, 0)
+        date_stop = self._dt(2030, 1, 9, 12, 0)
+
+        other_complex = self._complex('Other complex', 'TSTOTH')
+        self.other_facility.write({'complex_id': other_complex.id})
+
+        facility_set = self._available(date_start, date_stop)
+        self.assertEqual(facility_set, self.facility)
+
+        facility_set = self._available(date_start, date_stop,
+                                       complex_ids=other_complex.ids,
+                                       type_ids=self.type)
+        self.assertEqual(facility_set, self.other_facility)
+
+    def test_archived_facility(self):
+        self.other_facility.write({'active': False})
+
+        facility_set = self._available(
+            self._dt(2030, 1, 9, 10, 0), self._dt(2030, 1, 9, 12, 0))
+
+        self.assertEqual(facility_set, self.facility)
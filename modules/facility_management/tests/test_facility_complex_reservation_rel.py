@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityComplexReservationRel(FacilityTestCase):
+    """ The complex/reservation relation is a table kept in sync by triggers
+    on reservations, facilities and complexes
+    """
+
+    _rel_row_sql = '''
+        SELECT
+            complex_id,
+            company_id,
+            "state"
+        FROM
+            facility_complex_facility_reservation_rel
+        WHERE
+            reservation_id = %s
+    '''
+
+    def setUp(self):
+        super(TestFacilityComplexReservationRel, self).setUp()
+
+        self.reservation = self._reservation(
+            self.facility, self._dt(2030, 1, 8, 10, 0),
+            self._dt(2030, 1, 8, 12, 0), state='requested')
+
+    def _rel_row(self, reservation):
+        self.env['base'].flush()
+
+        self.env.cr.execute(self._rel_row_sql, [reservation.id])
+
+        return self.env.cr.fetchone()
+
+    def test_reservation_insert(self):
+        self.assertEqual(self._rel_row(self.reservation), (
+            self.complex.id, self.complex.company_id.id, 'requested'))
+
+        self.assertIn(self.reservation, self.complex.reservation_ids)
+
+    def test_reservation_state(self):
+        self.reservation.write({'state': 'confirmed'})
+
+        self.assertEqual(self._rel_row(self.reservation)[2], 'confirmed')
+
+    def test_reservation_facility(self):
+        other_complex = self._complex('Other complex', 'TSTOTH')
+        other_facility = self._facility(
+            'Test facility C', 'TSTFC', other_complex)
+
+        self.reservation.write({'facility_id': other_facility.id})
+
+        self.assertEqual(self._rel_row(self.reservation)[0],
+                         other_complex.id)
+
+    def test_facility_complex(self):
+        other_complex = self._complex('Other complex', 'TSTOTH')
+
+        self.facility.write({'complex_id': other_complex.id})
+
+        self.assertEqual(self._rel_row(self.reservation)[0],
+                         other_complex.id)
+
+    def test_facility_active(self):
+        self.facility.write({'active': False})
+        self.assertIsNone(self._rel_row(self.reservation))
+
+        self.facility.write({'active': True})
+        self.assertEqual(self._rel_row(self.reservation)[0], self.complex.id)
+
+    def test_complex_company(self):
+        company = self.env['res.company'].create({'name': 'Test company'})
+
+        self.complex.write({'company_id': company.id})
+
+        self.assertEqual(self._rel_row(self.reservation)[1], company.id)
+
+    def test_reservation_unlink(self):
+        reservation_id = self.reservation.id
+
+        self.reservation.unlink()
+
+        self.env.cr.execute(self._rel_row_sql, [reservation_id])
+        self.assertIsNone(self.env.cr.fetchone())
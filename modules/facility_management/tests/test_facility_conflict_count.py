@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityConflictCount(FacilityTestCase):
+    """ Conflicts are computed and searched from the occurrences given in the
+    context by the search available wizard
+    """
+
+    def setUp(self):
+        super(TestFacilityConflictCount, self).setUp()
+
+        self._reservation(self.facility, self._dt(2030, 1, 8, 10, 0),
+                          self._dt(2030, 1, 8, 12, 0))
+        self._reservation(self.other_facility, self._dt(2030, 1, 15, 9, 0),
+                          self._dt(2030, 1, 15, 10, 0), validate=False)
+
+        intervals = [
+            ['2030-01-08 11:00:00', '2030-01-08 13:00:00'],
+            ['2030-01-15 09:00:00', '2030-01-15 10:00:00']
+        ]
+        self.facility_obj = self.env['facility.facility'].with_context(
+            conflict_intervals=intervals)
+
+    def test_compute(self):
+        facility_set = self.facility_obj.browse(
+            (self.facility | self.other_facility).ids)
+
+        self.assertEqual(facility_set.mapped('conflict_count'), [1, 0])
+
+    def test_search(self):
+        facility_ids = (self.facility | self.other_facility).ids
+        domain = [('id', 'in', facility_ids)]
+
+        free = self.facility_obj.search(domain + [('conflict_count', '=', 0)])
+        self.assertEqual(free, self.other_facility)
+
+        busy = self.facility_obj.search(domain + [('conflict_count', '>', 0)])
+        self.assertEqual(busy, self.facility)
+
+    def test_without_intervals(self):
+        facility = self.env['facility.facility'].browse(self.facility.id)
+
+        self.assertEqual(facility.conflict_count, 0)
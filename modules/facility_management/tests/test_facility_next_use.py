@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import fields
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+from datetime import timedelta
+
+
+class TestFacilityNextUse(FacilityTestCase):
+    """ Next use of a facility, reservations which are not validated can
+    overlap the validated ones
+    """
+
+    def setUp(self):
+        super(TestFacilityNextUse, self).setUp()
+
+        self.now = fields.Datetime.now().replace(microsecond=0)
+
+    def _hours(self, hours):
+        return self.now + timedelta(hours=hours)
+
+    def _next_use(self):
+        self.facility.flush()
+        self.facility.invalidate_cache(['next_use'])
+
+        return self.facility.next_use
+
+    def test_upcoming(self):
+        self._reservation(self.facility, self._hours(-3), self._hours(-2))
+        self._reservation(self.facility, self._hours(2), self._hours(3))
+        self._reservation(self.facility, self._hours(4), self._hours(5))
+
+        self.assertEqual(self._next_use(), self._hours(2))
+
+    def test_in_progress(self):
+        self._reservation(self.facility, self._hours(-1), self._hours(1))
+        self._reservation(self.facility, self._hours(2), self._hours(3))
+
+        self.assertEqual(self._next_use(), self._hours(-1))
+
+    def test_overlapping_not_validated(self):
+        # The validated one started later but it has already finished
+        self._reservation(self.facility, self._hours(-3), self._hours(3),
+                          validate=False)
+        self._reservation(self.facility, self._hours(-2), self._hours(-1))
+        self._reservation(self.facility, self._hours(4), self._hours(5))
+
+        self.assertEqual(self._next_use(), self._hours(-3))
+
+    def test_ignored_reservations(self):
+        self._reservation(self.facility, self._hours(-1), self._hours(1),
+                          state='requested')
+        self._reservation(self.facility, self._hours(2), self._hours(3),
+                          active=False)
+
+        self.assertFalse(self._next_use())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityOccupancyReport(FacilityTestCase):
+    """ The report is stored as a table built on the timeline, the rows of
+    each facility only span its own reserved days
+    """
+
+    def setUp(self):
+        super(TestFacilityOccupancyReport, self).setUp()
+
+        self.timeline_obj = self.env['facility.reservation.timeline']
+        self.report_obj = self.env['facility.occupancy.report']
+
+        self._reservation(self.facility, self._dt(2030, 1, 8, 22, 0),
+                          self._dt(2030, 1, 9, 2, 0))
+        self._reservation(self.facility, self._dt(2030, 1, 11, 10, 0),
+                          self._dt(2030, 1, 12, 0, 0))
+        self._refresh()
+
+    def _refresh(self):
+        self.env['facility.reservation'].flush()
+        self.timeline_obj.refresh_materialized_view()
+        self.report_obj.refresh_materialized_view()
+
+    def _rows(self, facility):
+        self.report_obj.invalidate_cache()
+
+        domain = [('facility_id', '=', facility.id)]
+        rows = self.report_obj.search(domain, order='date ASC')
+
+        return [(str(row.date), row.occupied_hours) for row in rows]
+
+    def test_days(self):
+        self.assertEqual(self._rows(self.facility), [
+            ('2030-01-08', 2.0),
+            ('2030-01-09', 2.0),
+            ('2030-01-10', 0.0),
+            ('2030-01-11', 14.0)
+        ])
+
+        self.assertFalse(self._rows(self.other_facility))
+
+    def test_apply_delta(self):
+        self._reservation(self.other_facility, self._dt(2030, 1, 9, 9, 0),
+                          self._dt(2030, 1, 9, 12, 0))
+        self.env['facility.reservation'].flush()
+
+        self.assertTrue(self.timeline_obj.apply_delta())
+        self.assertFalse(self.report_obj._is_stale())
+        self.assertEqual(self.report_obj.apply_delta(), 1)
+
+        self.assertEqual(self._rows(self.other_facility),
+                         [('2030-01-09', 3.0)])
+        self.assertEqual(len(self._rows(self.facility)), 4)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityReservation(FacilityTestCase):
+    """ Searches on reservation computed fields which are solved in the
+    database
+    """
+
+    def setUp(self):
+        super(TestFacilityReservation, self).setUp()
+
+        self.reservation_obj = self.env['facility.reservation']
+
+        self.scheduler = self.env['facility.reservation.scheduler'].create({
+            'name': 'Test scheduler',
+            'facility_id': self.facility.id
+        })
+
+        self.scheduled = self._reservation(
+            self.facility, self._dt(2030, 1, 8, 10, 0),
+            self._dt(2030, 1, 8, 12, 0), scheduler_id=self.scheduler.id)
+        self.unscheduled = self._reservation(
+            self.facility, self._dt(2030, 1, 9, 10, 0),
+            self._dt(2030, 1, 9, 12, 0))
+
+    def _search(self, operator, value):
+        domain = [
+            ('id', 'in', (self.scheduled | self.unscheduled).ids),
+            ('has_scheduler', operator, value)
+        ]
+
+        return self.reservation_obj.search(domain)
+
+    def test_has_scheduler(self):
+        self.assertTrue(self.scheduled.has_scheduler)
+        self.assertFalse(self.unscheduled.has_scheduler)
+
+    def test_search_has_scheduler(self):
+        self.assertEqual(self._search('=', True), self.scheduled)
+        self.assertEqual(self._search('!=', False), self.scheduled)
+        self.assertEqual(self._search('=', False), self.unscheduled)
+        self.assertEqual(self._search('!=', True), self.unscheduled)
+        self.assertEqual(self._search('=', None), self.unscheduled)
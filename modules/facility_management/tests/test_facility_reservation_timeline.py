@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestFacilityReservationTimeline(FacilityTestCase):
+    """ Changes in the source tables are logged by triggers, in the same
+    transaction, so the staleness of the timeline does not depend on the
+    table statistics
+    """
+
+    def setUp(self):
+        super(TestFacilityReservationTimeline, self).setUp()
+
+        self.timeline_obj = self.env['facility.reservation.timeline']
+
+        self.reservation = self._reservation(
+            self.facility, self._dt(2030, 1, 8, 10, 0),
+            self._dt(2030, 1, 8, 12, 0))
+        self.reservation.flush()
+
+        self.timeline_obj.refresh_materialized_view()
+
+    def _timeline(self, reservation):
+        self.timeline_obj.invalidate_cache()
+
+        domain = [('reservation_id', '=', reservation.id)]
+        return self.timeline_obj.search(domain)
+
+    def test_refresh(self):
+        self.assertFalse(self.timeline_obj._is_stale())
+
+        row = self._timeline(self.reservation)
+        self.assertEqual(row.facility_id, self.facility)
+        self.assertEqual(row.complex_id, self.complex)
+
+    def test_source_change_makes_it_stale(self):
+        other = self._complex('Other complex', 'TSTOTH')
+        self.facility.write({'complex_id': other.id})
+        self.facility.flush()
+
+        self.assertTrue(self.timeline_obj._is_stale())
+
+        self.timeline_obj.refresh_materialized_view()
+
+        self.assertFalse(self.timeline_obj._is_stale())
+        self.assertEqual(self._timeline(self.reservation).complex_id, other)
+
+    def test_unread_column_is_not_logged(self):
+        self.facility.write({'users': 20, 'excess': 20})
+        self.complex.write({'code': 'TSTNEW'})
+        self.facility.flush()
+
+        self.assertFalse(self.timeline_obj._is_stale())
+
+    def test_apply_delta(self):
+        other = self._reservation(
+            self.other_facility, self._dt(2030, 1, 9, 10, 0),
+            self._dt(2030, 1, 9, 12, 0))
+
+        self.reservation.write({
+            'date_start': self._dt(2030, 1, 8, 9, 0),
+            'state': 'requested'
+        })
+        self.reservation.flush()
+
+        # Reservation changes are applied as deltas, without full refresh
+        self.assertFalse(self.timeline_obj._is_stale())
+        self.assertEqual(self.timeline_obj.apply_delta(), 2)
+        self.assertEqual(self.timeline_obj.apply_delta(), 0)
+
+        row = self._timeline(self.reservation)
+        self.assertEqual(row.date_start, self._dt(2030, 1, 8, 9, 0))
+        self.assertEqual(row.state, 'requested')
+        self.assertTrue(self._timeline(other))
+
+        # Archived reservations are removed from the timeline
+        other.write({'active': False})
+        other.flush()
+        self.timeline_obj.apply_delta()
+
+        self.assertFalse(self._timeline(other))
+
+    def test_rebuild_restores_dependents(self):
+        cr = self.env.cr
+
+        cr.execute('''
+            CREATE VIEW test_timeline_dependent AS
+            SELECT reservation_id FROM facility_reservation_timeline
+        ''')
+
+        self.timeline_obj._rebuild_materialized_view(
+            self.timeline_obj._get_definition_hash())
+
+        for name in ('test_timeline_dependent', 'facility_occupancy_report'):
+            cr.execute('SELECT to_regclass ( %s )', [name])
+            self.assertTrue(cr.fetchone()[0], name)
+
+        cr.execute('''
+            SELECT COUNT ( * ) FROM test_timeline_dependent
+            WHERE reservation_id = %s
+        ''', [self.reservation.id])
+        self.assertEqual(cr.fetchone()[0], 1)
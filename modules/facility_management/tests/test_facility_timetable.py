@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.tests import tagged
+
+from odoo.addons.facility_management.tests.common import FacilityHttpCase
+from odoo.addons.facility_management.utils.timetable_cache import \
+    timetable_cache
+
+
+@tagged('post_install', '-at_install')
+class TestFacilityTimetable(FacilityHttpCase):
+    """ Public timetable, rendered on cache misses and validated with the
+    ETag on the following requests
+    """
+
+    def setUp(self):
+        super(TestFacilityTimetable, self).setUp()
+
+        self._reservation(self.facility, self._dt(2030, 1, 8, 10, 0),
+                          self._dt(2030, 1, 8, 12, 0))
+
+        self.url = '/facility/timetable?week=2030-01-07&facility={}'.format(
+            self.facility.id)
+
+        timetable_cache.clear()
+
+    def test_cache_miss(self):
+        response = self.url_open(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response.headers['Content-Type'])
+        self.assertIn(self.facility.name, response.text)
+        self.assertTrue(response.headers.get('ETag'))
+
+        # Second request is served from the cache, with the same body
+        cached = self.url_open(self.url)
+
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.text, response.text)
+
+    def test_not_modified(self):
+        response = self.url_open(self.url)
+        etag = response.headers['ETag']
+
+        headers = {'If-None-Match': etag}
+        response = self.url_open(self.url, headers=headers)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # A new reservation in the week changes the signature
+        self._reservation(self.facility, self._dt(2030, 1, 9, 10, 0),
+                          self._dt(2030, 1, 9, 12, 0))
+        response = self.url_open(self.url, headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
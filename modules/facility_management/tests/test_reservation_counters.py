@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.addons.facility_management.tests.common import FacilityTestCase
+
+
+class TestReservationCounters(FacilityTestCase):
+    """ Stored reservation counters are kept up to date on reservation
+    changes and searched as plain columns
+    """
+
+    def setUp(self):
+        super(TestReservationCounters, self).setUp()
+
+        self.facility_obj = self.env['facility.facility']
+
+        self.confirmed = self._reservation(
+            self.facility, self._dt(2030, 1, 8, 10, 0),
+            self._dt(2030, 1, 8, 12, 0))
+        self.requested = self._reservation(
+            self.facility, self._dt(2030, 1, 9, 10, 0),
+            self._dt(2030, 1, 9, 12, 0), state='requested')
+
+    def _search(self, field_name, operator, value):
+        facility_ids = (self.facility | self.other_facility).ids
+        domain = [('id', 'in', facility_ids), (field_name, operator, value)]
+
+        return self.facility_obj.search(domain)
+
+    def test_counters(self):
+        self.assertEqual(self.facility.reservation_count, 2)
+        self.assertEqual(self.facility.confirmed_reservation_count, 1)
+        self.assertEqual(self.other_facility.confirmed_reservation_count, 0)
+
+    def test_search_confirmed(self):
+        self.assertEqual(self._search('confirmed_reservation_count', '=', 1),
+                         self.facility)
+        self.assertEqual(self._search('confirmed_reservation_count', '=', 0),
+                         self.other_facility)
+
+        self.requested.write({'state': 'confirmed'})
+
+        self.assertEqual(self._search('confirmed_reservation_count', '>', 1),
+                         self.facility)
+
+    def test_search_after_archive(self):
+        self.confirmed.write({'active': False})
+
+        self.assertEqual(self._search('confirmed_reservation_count', '>', 0),
+                         self.facility_obj)
+        self.assertEqual(self._search('reservation_count', '=', 1),
+                         self.facility)
+
+    def test_move_reservation(self):
+        self.confirmed.write({'facility_id': self.other_facility.id})
+
+        self.assertEqual(self._search('confirmed_reservation_count', '=', 1),
+                         self.other_facility)
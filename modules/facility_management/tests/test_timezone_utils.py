@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo.tests.common import BaseCase
+
+from odoo.addons.facility_management.utils.timezone_utils import \
+    utc_offset, to_utc, from_utc, _local_day_offset, _utc_day_offset
+
+from datetime import date, datetime, timedelta
+
+
+TZ = 'Europe/Madrid'
+
+# In 2024 Madrid moves from CET to CEST at 01:00 UTC on March 31st and back
+# to CET at 01:00 UTC on October 27th
+SPRING_FORWARD = date(2024, 3, 31)
+FALL_BACK = date(2024, 10, 27)
+
+CET = timedelta(hours=1)
+CEST = timedelta(hours=2)
+
+
+class TestTimezoneUtils(BaseCase):
+    """ Conversions around the DST transitions, the cached day offsets must
+    never be used on the days on which the offset changes
+    """
+
+    def test_day_offsets(self):
+        self.assertEqual(_local_day_offset(TZ, date(2024, 3, 30)), CET)
+        self.assertEqual(_utc_day_offset(TZ, date(2024, 7, 1)), CEST)
+
+        for day in (SPRING_FORWARD, FALL_BACK):
+            self.assertIsNone(_local_day_offset(TZ, day))
+            self.assertIsNone(_utc_day_offset(TZ, day))
+
+    def test_utc_offset(self):
+        self.assertEqual(utc_offset(TZ, datetime(2024, 3, 31, 0, 59)), CET)
+        self.assertEqual(utc_offset(TZ, datetime(2024, 3, 31, 1, 0)), CEST)
+
+        self.assertEqual(utc_offset(TZ, datetime(2024, 10, 27, 0, 59)), CEST)
+        self.assertEqual(utc_offset(TZ, datetime(2024, 10, 27, 1, 0)), CET)
+
+    def test_spring_forward(self):
+        self.assertEqual(to_utc(TZ, datetime(2024, 3, 31, 1, 0)),
+                         datetime(2024, 3, 31, 0, 0))
+        self.assertEqual(to_utc(TZ, datetime(2024, 3, 31, 10, 0)),
+                         datetime(2024, 3, 31, 8, 0))
+
+        # Nonexistent wall time, taken as standard time
+        self.assertEqual(to_utc(TZ, datetime(2024, 3, 31, 2, 30)),
+                         datetime(2024, 3, 31, 1, 30))
+
+        self.assertEqual(from_utc(TZ, datetime(2024, 3, 31, 0, 30)),
+                         datetime(2024, 3, 31, 1, 30))
+        self.assertEqual(from_utc(TZ, datetime(2024, 3, 31, 1, 30)),
+                         datetime(2024, 3, 31, 3, 30))
+
+    def test_fall_back(self):
+        self.assertEqual(to_utc(TZ, datetime(2024, 10, 27, 1, 0)),
+                         datetime(2024, 10, 26, 23, 0))
+        self.assertEqual(to_utc(TZ, datetime(2024, 10, 27, 12, 0)),
+                         datetime(2024, 10, 27, 11, 0))
+
+        # Ambiguous wall time, taken as standard time
+        self.assertEqual(to_utc(TZ, datetime(2024, 10, 27, 2, 30)),
+                         datetime(2024, 10, 27, 1, 30))
+
+        self.assertEqual(from_utc(TZ, datetime(2024, 10, 27, 0, 30)),
+                         datetime(2024, 10, 27, 2, 30))
+        self.assertEqual(from_utc(TZ, datetime(2024, 10, 27, 1, 30)),
+                         datetime(2024, 10, 27, 2, 30))
+
+    def test_round_trip(self):
+        """ Hours of the days around both transitions, the results must not
+        depend on which one of them was converted first
+        """
+
+        for day in (SPRING_FORWARD, FALL_BACK):
+            start = datetime.combine(day, datetime.min.time())
+            start -= timedelta(days=1)
+            for hour in range(72):
+                value = start + timedelta(hours=hour)
+                local = from_utc(TZ, value)
+                self.assertEqual(local - value, utc_offset(TZ, value))
+                if local.date() != day:
+                    self.assertEqual(to_utc(TZ, local), value)
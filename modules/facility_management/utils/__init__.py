@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from . import recurrence_utils
+from . import timezone_utils
+from . import timetable_cache
+from . import sql_utils
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+""" ORM-free recurrence expansion used by ``facility.scheduler.mixin``.
+
+Scheduler fields are frozen in a ``RecurrenceRule`` snapshot, which is
+hashable, so the expansion can be memoized and shared by every method that
+needs the scheduled dates.
+"""
+
+from collections import namedtuple
+from datetime import datetime, time
+from functools import lru_cache
+from itertools import islice
+
+from dateutil.rrule import rrule, weekdays, DAILY, WEEKLY, MONTHLY, YEARLY
+from dateutil.rrule import MO
+
+
+RecurrenceRule = namedtuple('RecurrenceRule', [
+    'date_base',
+    'repeat',
+    'interval_type',
+    'interval_number',
+    'weekdays',
+    'month_type',
+    'finish_type',
+    'finish_date',
+    'finish_number'
+])
+
+FREQUENCIES = {
+    'day': DAILY,
+    'week': WEEKLY,
+    'month': MONTHLY,
+    'year': YEARLY
+}
+
+
+def build_rrule(rule, bounded=True):
+    """ Build the ``dateutil.rrule`` equivalent to the given snapshot.
+
+    Args:
+        rule (RecurrenceRule): frozen scheduler values
+        bounded (bool, optional): if False, ``finish_type``, ``finish_date``
+        and ``finish_number`` will be ignored
+
+    Returns:
+        rrule: recurrence rule starting at ``rule.date_base``
+    """
+
+    dtstart = datetime.combine(rule.date_base, time.min)
+    frequency = FREQUENCIES.get(rule.interval_type, DAILY)
+
+    kwargs = {
+        'dtstart': dtstart,
+        'interval': max(rule.interval_number or 1, 1),
+        'wkst': MO
+    }
+
+    if rule.interval_type == 'week':
+        # facility.weekday sequence matches with ISO weekday (1 to 7)
+        if rule.weekdays:
+            kwargs['byweekday'] = [weekdays[seq - 1] for seq in rule.weekdays]
+
+    elif rule.interval_type == 'month' and rule.month_type == 'week':
+        # Same weekday and position in month (ex: third tuesday), the fifth
+        # one is taken as the last one because not every month has it
+        nth = (rule.date_base.day + 6) // 7
+        nth = -1 if nth > 4 else nth
+        kwargs['byweekday'] = weekdays[rule.date_base.weekday()](nth)
+
+    if bounded:
+        if rule.finish_type == 'number':
+            kwargs['count'] = max(rule.finish_number or 1, 1)
+        else:
+            finish_date = rule.finish_date or rule.date_base
+            kwargs['until'] = datetime.combine(finish_date, time.max)
+
+    return rrule(frequency, **kwargs)
+
+
+def iter_dates(rule):
+    """ Lazily yields the dates resulting from the given snapshot.
+
+    Args:
+        rule (RecurrenceRule): frozen scheduler values
+
+    Yields:
+        date: each one of the scheduled dates
+    """
+
+    if not rule.repeat:
+        yield rule.date_base
+        return
+
+    for dt in build_rrule(rule):
+        yield dt.date()
+
+
+@lru_cache(maxsize=512)
+def expand_dates(rule, limit=1024):
+    """ Memoized expansion of the given snapshot.
+
+    At most ``limit + 1`` dates are computed, this allows callers to detect
+    that the limit has been exceeded without expanding endless rules.
+
+    Args:
+        rule (RecurrenceRule): frozen scheduler values
+        limit (int, optional): maximum number of expected dates
+
+    Returns:
+        tuple: scheduled dates
+    """
+
+    return tuple(islice(iter_dates(rule), limit + 1))
+
+
+@lru_cache(maxsize=512)
+def next_date(rule, date_cursor):
+    """ Memoized computation of the first repetition after ``date_cursor``.
+    Finish criteria are ignored.
+
+    Args:
+        rule (RecurrenceRule): frozen scheduler values
+        date_cursor (date): date from which the next is to be calculated
+
+    Returns:
+        date: next repetition date or None if there is no one
+    """
+
+    dt = datetime.combine(date_cursor, time.min)
+    result = build_rrule(rule, bounded=False).after(dt, inc=False)
+
+    return result.date() if result else None
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+""" Helpers to search computed fields by an aggregated SQL value.
+
+The operator is taken from a whitelist and the value is always passed as a
+bound parameter, so each search method produces a bounded set of statement
+texts. Results are returned as ``inselect`` domains, then filtering takes
+place entirely in PostgreSQL.
+"""
+
+from odoo.exceptions import UserError
+from odoo.tools.translate import _
+
+
+COMPARISON_OPERATORS = {
+    '=': '= %s',
+    '!=': '<> %s',
+    '<>': '<> %s',
+    '<': '< %s',
+    '<=': '<= %s',
+    '>': '> %s',
+    '>=': '>= %s',
+    'in': '= ANY ( %s )',
+    'not in': '<> ALL ( %s )'
+}
+
+
+def build_comparison(operator, value):
+    """ Get the SQL comparison for the given domain operator and value.
+
+    Boolean values, or None, follow the Odoo semantics for numeric fields,
+    where ``False`` means zero: ``('=', False)`` is translated to ``<= 0``
+    and ``('=', True)`` to ``> 0``.
+
+    Args:
+        operator (str): domain leaf operator
+        value (mixed): domain leaf value
+
+    Returns:
+        tuple: ``(comparison, value)`` where comparison is an SQL snippet
+        with a single ``%s`` placeholder for the value
+
+    Raises:
+        UserError: if the operator is not supported
+    """
+
+    if isinstance(value, bool) or value is None:
+        positive = (operator == '=') == bool(value)
+        operator, value = ('>', 0) if positive else ('<=', 0)
+
+    comparison = COMPARISON_OPERATORS.get(operator)
+    if not comparison:
+        raise UserError(_('Operator not implemented: %s') % operator)
+
+    if operator in ('in', 'not in'):
+        value = list(value or [])
+
+    return comparison, value
+
+
+def aggregate_domain(sql, operator, value, params=None, field_name='id'):
+    """ Build an ``inselect`` domain for a query which selects the records
+    whose aggregated value matches the given operator and value.
+
+    The query must select a single column of ids and contain a single
+    ``{comparison}`` placeholder, which has to be placed after every other
+    parameter of the query, e.g.::
+
+        SELECT fc."id" FROM facility_complex AS fc
+        LEFT JOIN facility_facility AS ff ON ff.complex_id = fc."id"
+        GROUP BY fc."id"
+        HAVING COUNT ( ff."id" ) {comparison}
+
+    Args:
+        sql (str): query with a ``{comparison}`` placeholder
+        operator (str): domain leaf operator
+        value (mixed): domain leaf value
+        params (list, optional): other query parameters
+        field_name (str, optional): field to be compared with the result
+
+    Returns:
+        list: domain like ``[(field_name, 'inselect', (sql, params))]``
+
+    Raises:
+        UserError: if the operator is not supported
+    """
+
+    comparison, value = build_comparison(operator, value)
+
+    query = sql.format(comparison=comparison)
+    query_params = list(params or []) + [value]
+
+    return [(field_name, 'inselect', (query, query_params))]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+""" In-process cache for the rendered public facility timetables.
+
+Entries are keyed by ``(database, week, facility ids, lang)`` and store the
+signature of the data they were rendered from. Reservation changes drop the
+entries of the affected facilities and weeks in the current worker, the
+signature protects the entries of the other workers.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import RLock
+
+
+def week_start(value):
+    """ Monday, at midnight, of the week which includes the given value
+
+    Args:
+        value (date|datetime): any date in the week
+
+    Returns:
+        datetime: first day of the week
+    """
+
+    value = datetime(value.year, value.month, value.day)
+
+    return value - timedelta(days=value.weekday())
+
+
+class TimetableCache(object):
+    """ Thread-safe LRU cache of rendered timetables
+    """
+
+    def __init__(self, max_entries=256):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    @staticmethod
+    def key(dbname, week, facility_ids, lang):
+        return (dbname, week_start(week), tuple(sorted(facility_ids)), lang)
+
+    def get(self, key, signature):
+        """ Get the cached body if it was rendered from the given signature
+
+        Args:
+            key (tuple): key built with ``TimetableCache.key``
+            signature (tuple): current signature of the timetable data
+
+        Returns:
+            bytes: cached body or None
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+
+            if entry[0] != signature:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return entry[1]
+
+    def set(self, key, signature, body):
+        with self._lock:
+            self._entries[key] = (signature, body)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, dbname, targets):
+        """ Drop the entries which show any of the given facility weeks
+
+        Args:
+            dbname (str): database name
+            targets (iterable): ``(facility_id, week)`` tuples, where week is
+                any date in the week
+        """
+
+        targets = set(
+            (facility_id, week_start(week)) for facility_id, week in targets)
+
+        if not targets:
+            return
+
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if key[0] != dbname:
+                    continue
+
+                if any((facility_id, key[1]) in targets
+                       for facility_id in key[2]):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+timetable_cache = TimetableCache()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+""" Cached timezone conversions shared by the scheduler and the reports.
+
+Timezone objects are cached by name and UTC offsets are cached by
+``(timezone, day)``. A day is only cached when its offset does not change
+from one midnight to the next, the days on which a DST transition takes place
+are always solved by ``pytz``, so the cache never hides a transition.
+"""
+
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+from pytz import timezone, utc
+
+
+@lru_cache(maxsize=128)
+def get_timezone(tz_name=None):
+    """ Get the ``pytz`` timezone with the given name
+
+    Args:
+        tz_name (str, optional): timezone name, UTC will be used if None
+
+    Returns:
+        tzinfo: pytz timezone
+    """
+
+    return timezone(tz_name or utc.zone)
+
+
+@lru_cache(maxsize=4096)
+def _local_day_offset(tz_name, day):
+    """ UTC offset for a whole local day, None if it changes along the day
+    """
+
+    tz = get_timezone(tz_name)
+
+    start = datetime.combine(day, time.min)
+    stop = start + timedelta(days=1)
+
+    offset = tz.localize(start, is_dst=False).utcoffset()
+    if offset != tz.localize(stop, is_dst=False).utcoffset():
+        return None
+
+    return offset
+
+
+@lru_cache(maxsize=4096)
+def _utc_day_offset(tz_name, day):
+    """ UTC offset for a whole UTC day, None if it changes along the day
+    """
+
+    tz = get_timezone(tz_name)
+
+    start = datetime.combine(day, time.min)
+    stop = start + timedelta(days=1)
+
+    offset = tz.fromutc(start).utcoffset()
+    if offset != tz.fromutc(stop).utcoffset():
+        return None
+
+    return offset
+
+
+def utc_offset(tz_name, dt):
+    """ Get the offset of the given timezone at the given UTC datetime
+
+    Args:
+        tz_name (str): timezone name
+        dt (datetime): naive UTC datetime
+
+    Returns:
+        timedelta: offset to be added to the UTC value to get the local one
+    """
+
+    offset = _utc_day_offset(tz_name, dt.date())
+    if offset is None:
+        offset = get_timezone(tz_name).fromutc(dt).utcoffset()
+
+    return offset
+
+
+def to_utc(tz_name, dt):
+    """ Convert a naive local datetime to a naive UTC datetime. Nonexistent
+    and ambiguous wall times, around DST transitions, are taken as standard
+    time.
+
+    Args:
+        tz_name (str): timezone name
+        dt (datetime): naive local datetime
+
+    Returns:
+        datetime: naive UTC datetime
+    """
+
+    offset = _local_day_offset(tz_name, dt.date())
+    if offset is None:
+        offset = get_timezone(tz_name).localize(dt, is_dst=False).utcoffset()
+
+    return dt - offset
+
+
+def from_utc(tz_name, dt):
+    """ Convert a naive UTC datetime to a naive local datetime
+
+    Args:
+        tz_name (str): timezone name
+        dt (datetime): naive UTC datetime
+
+    Returns:
+        datetime: naive local datetime
+    """
+
+    return dt + utc_offset(tz_name, dt)
+
+
+def to_utc_datetimes(tz_name, pairs, day_limit=False):
+    """ Convert a list of local ``(date, float-hour)`` pairs to naive UTC
+    datetimes in a single call.
+
+    Args:
+        tz_name (str): timezone name
+        pairs (iterable): ``(date, hours)`` tuples, hours as float
+        day_limit (bool, optional): if True a maximum of 24 hours will be
+            joined to each date
+
+    Returns:
+        list: naive UTC datetimes in the same order as the given pairs
+    """
+
+    result = []
+    zero_time = time.min
+
+    for day, hours in pairs:
+        hours = hours or 0.0
+        if day_limit:
+            hours = min(hours, 24)
+
+        local = datetime.combine(day, zero_time)
+        local += timedelta(seconds=hours * 3600.0)
+
+        result.append(to_utc(tz_name, local))
+
+    return result
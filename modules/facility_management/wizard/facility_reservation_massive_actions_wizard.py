@@ -245,10 +245,22 @@ class FacilityReservationMassiveActionsWizard(models.TransientModel):
         help='Disable tracking'
     )
 
+    background = fields.Boolean(
+        string='In background',
+        required=False,
+        readonly=False,
+        index=False,
+        default=False,
+        help=('If checked, the action will be performed by a background job '
+              'which commits the reservations in chunks')
+    )
+
     def perform_action(self):
         tracking_disable_ctx = self.env.context.copy()
         tracking_disable_ctx.update({'tracking_disable': True})
 
+        result = None
+
         for record in self:
             if record.tracking_disable:
                 record = record.with_context(tracking_disable_ctx)
@@ -257,11 +269,36 @@ class FacilityReservationMassiveActionsWizard(models.TransientModel):
             method = getattr(record, method_name, False)
 
             if method:
-                method()
+                result = method() or result
             else:
                 message = _('Unknown wizard action')
                 raise ValueError(message)
 
+        return result
+
+    def _enqueue_job(self, values=None):
+        """ Request a background job to perform the wizard action over the
+        target reservations
+
+        Returns:
+            dict: window action to show the job progress
+        """
+
+        self.ensure_one()
+
+        job_obj = self.env['facility.reservation.job']
+        selection = dict(self._dynamic_action_selection())
+
+        name = _('{action}: {count} reservations').format(
+            action=selection.get(self.action),
+            count=len(self.target_reservation_ids))
+
+        job = job_obj.enqueue(
+            self.action, self.target_reservation_ids.ids, name,
+            values=values, track=not self.tracking_disable)
+
+        return job.view_job()
+
     def _serialize_update_values(self):
         self.ensure_one()
 
@@ -280,18 +317,39 @@ class FacilityReservationMassiveActionsWizard(models.TransientModel):
         return values
 
     def perform_action_update(self):
+        """ Reservations are updated through ``bulk_write``, which checks
+        rights and conflicts beforehand, writes in chunks and posts a single
+        summary message in each complex.
+        """
+
+        result = None
 
         for record in self:
             if not record.target_reservation_ids:
                 continue
 
             values = record._serialize_update_values()
-            if values:
-                record.target_reservation_ids.write(values)
+            if not values:
+                continue
+
+            if record.background:
+                result = record._enqueue_job(values)
+            else:
+                record.target_reservation_ids.bulk_write(
+                    values, track=not record.tracking_disable)
+
+        return result
 
     def perform_action_unbind(self):
+        result = None
+
         for record in self:
             if not record.target_reservation_ids:
                 continue
 
-            record.target_reservation_ids.unbind()
+            if record.background:
+                result = record._enqueue_job()
+            else:
+                record.target_reservation_ids.unbind()
+
+        return result
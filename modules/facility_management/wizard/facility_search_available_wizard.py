@@ -75,6 +75,16 @@ class FacilitySearchAvailableWizard(models.TransientModel):
         help='Check to exclude chosen complexes'
     )
 
+    max_conflicts = fields.Integer(
+        string='Allowed conflicts',
+        required=False,
+        readonly=False,
+        index=False,
+        default=0,
+        help=('Maximum number of occurrences that can be in conflict with '
+              'existing reservations. Use it to find mostly free facilities')
+    )
+
     @staticmethod
     def _real_id(record_set, single=False):
         """ Return a list with no NewId's of a single no NewId
@@ -114,20 +124,15 @@ class FacilitySearchAvailableWizard(models.TransientModel):
             'default_type_ids': type_ops,
             'default_complex_ids': complex_ops,
             'default_exclude_types': self.exclude_types,
-            'default_exclude_complexes': self.exclude_complexes
+            'default_exclude_complexes': self.exclude_complexes,
+            'default_max_conflicts': self.max_conflicts
         })
 
         return ctx
 
-    def _search_for_facilities(self):
+    def _compute_facility_domain(self):
         domains = []
 
-        reservation_set = self.matching_reservations()
-        if reservation_set:
-            reservation_ids = reservation_set.mapped('id')
-            not_reserved = [('reservation_ids', '<>', reservation_ids)]
-            domains.append(not_reserved)
-
         if self.type_ids:
             type_ids = self._real_id(self.type_ids)
             type_op = 'not in' if self.exclude_types else 'in'
@@ -140,11 +145,39 @@ class FacilitySearchAvailableWizard(models.TransientModel):
             complex_domain = [('complex_id', complex_op, complex_ids)]
             domains.append(complex_domain)
 
-        facility_domain = AND(domains)
-        facility_obj = self.env['facility.facility']
-        facility_set = facility_obj.search(facility_domain)
+        return AND(domains) if domains else []
+
+    def _conflict_intervals(self):
+        """ Scheduled occurrences, as strings, to be sent in the context of
+        the facility action. Facilities compute and search their number of
+        conflicts from them.
+
+        Returns:
+            list: list of ``[date_start, date_stop]`` pairs
+        """
+
+        self.ensure_one()
+
+        return [
+            [fields.Datetime.to_string(date_start),
+             fields.Datetime.to_string(date_stop)]
+            for date_start, date_stop in self.scheduled_intervals()
+        ]
+
+    def _search_for_facilities(self):
+        """ Domain of the facilities with no more than the allowed conflicts,
+        they are counted over the intervals given in the context
+
+        Returns:
+            list: facility domain
+        """
+
+        self.ensure_one()
+
+        max_conflicts = self.max_conflicts or 0
+        conflict_domain = [('conflict_count', '<=', max_conflicts)]
 
-        return facility_set
+        return AND([self._compute_facility_domain(), conflict_domain])
 
     def view_facilities(self):
         self.ensure_one()
@@ -157,7 +190,7 @@ class FacilitySearchAvailableWizard(models.TransientModel):
         ctx.update(safe_eval(action.context))
         ctx.update(self.as_context_default())
 
-        facility_set = self._search_for_facilities()
+        ctx['conflict_intervals'] = self._conflict_intervals()
 
         serialized = {
             'type': 'ir.actions.act_window',
@@ -165,7 +198,7 @@ class FacilitySearchAvailableWizard(models.TransientModel):
             'target': 'main',
             'name': _('Facilities that match the criteria'),
             'view_mode': action.view_mode,
-            'domain': [('id', 'in', facility_set.mapped('id'))],
+            'domain': self._search_for_facilities(),
             'context': ctx,
             'search_view_id': action.search_view_id.id,
             'help': action.help
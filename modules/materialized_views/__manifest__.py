@@ -51,6 +51,8 @@ read-heavy operations, making it ideal for reporting and analytics.
         ],
     },
     'data': [
+        'security/materialized_view_state.xml',
+        'security/materialized_view_delta.xml',
         'data/ir_cron_data.xml'
     ],
     'demo': [
@@ -4,4 +4,8 @@
 #    __openerp__.py file at the root folder of this module.                   #
 ###############################################################################
 
-from . import materialized_view
\ No newline at end of file
+# Models are initialized in import order, the state and delta tables, and
+# the delta trigger function, have to exist before any view is built
+from . import materialized_view_state
+from . import materialized_view_delta
+from . import materialized_view
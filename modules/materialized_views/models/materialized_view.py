@@ -4,17 +4,23 @@
 #    __openerp__.py file at the root folder of this module.                   #
 ###############################################################################
 
-from odoo import models, fields, api
+from odoo import models, fields, api, SUPERUSER_ID
 from odoo.tools.translate import _
 from odoo.tools import drop_view_if_exists
 
-from datetime import datetime
 from logging import getLogger
+from hashlib import sha1
+from weakref import WeakKeyDictionary
 
 
 _logger = getLogger(__name__)
 
 
+# Names of the models whose views have to be refreshed once the transaction
+# of each cursor has been committed
+_pending_refreshes = WeakKeyDictionary()
+
+
 class MaterializedView(models.AbstractModel):
     """ Abstract model representing a PostgreSQL materialized view in Odoo.
     This model provides a framework for creating Odoo models based on
@@ -29,6 +35,58 @@ class MaterializedView(models.AbstractModel):
                     'view in Odoo')
 
     _auto = False
+
+    # Tables (or other materialized views) the view is built from. Changes
+    # in the tables are logged by triggers and make the view stale, views
+    # without source tables are always refreshed by the scheduled action
+    _source_tables = []
+
+    # Columns read by the view from each source table. Updates of the other
+    # columns are not logged, so stored computed fields or counters written
+    # in the source tables do not make the view stale, e.g.:
+    # {'facility_facility': ['complex_id', 'type_id']}. All the columns are
+    # watched in the tables which are not declared
+    _source_columns = {}
+
+    # Columns which identify each row in the results of ``_view_sql``. When
+    # they are declared, ``_view_sql`` must not include the ``id`` column, it
+    # will be derived from them so it does not change between refreshes. A
+    # single key column is used as it is, so it must be an integer one
+    _natural_key = []
+
+    # Columns which identify each row. A unique index is built on them, it
+    # is required by PostgreSQL to refresh the view concurrently
+    _unique_key = ['id']
+
+    # If True, new versions of the view are created WITH NO DATA and they
+    # will be populated by the scheduled action, so module upgrades do not
+    # have to wait for large aggregations. The view cannot be read until then
+    _defer_population = False
+
+    # Secondary indexes, by name suffix. Each one is a dictionary with the
+    # ``columns`` and, optionally, the ``using`` method and a ``where``
+    # condition to make it partial, e.g.:
+    # {'span': {'columns': ['facility_id', 'span'], 'using': 'gist'}}
+    _indexes = {}
+
+    # Storage of the results: ``view`` keeps them in a materialized view
+    # which is refreshed as a whole, ``table`` keeps them in a regular table
+    # maintained incrementally, only the groups affected by source changes
+    # are recomputed. Table storage requires ``_natural_key`` and
+    # ``_delta_key``
+    _storage = 'view'
+
+    # Column of the ``_view_sql`` results which identifies each group of
+    # rows recomputed together. Conditions on it must be pushed down by
+    # PostgreSQL into the sources, so it has to be a grouping column
+    _delta_key = None
+
+    # Source tables whose changes are tracked by triggers, with the column
+    # which holds the value of the delta key, e.g.:
+    # {'facility_reservation': 'id'}. Changes in the other source tables
+    # still lead to a full refresh by the scheduled action
+    _delta_sources = {}
+
     _view_sql = '''
         SELECT
             ROW_NUMBER() OVER()::INTEGER AS "id",
@@ -39,64 +97,779 @@ class MaterializedView(models.AbstractModel):
     '''
 
     def init(self):
+        """ The view is only rebuilt when its definition, the query and the
+        indexes, differs from the one stored in the database. The new version
+        is built under a temporary name and then swapped with the old one in
+        the same transaction. Views built on it are dropped along with the
+        old version, they are created again after the swap.
+        """
+
+        if self._abstract:
+            return
+
+        self._check_storage()
+        self._setup_change_triggers()
+
+        definition = self._get_definition_hash()
+        if self._get_stored_definition_hash() == definition:
+            _logger.debug(f'Materialized view {self._table} is up to date')
+            return
+
+        self._rebuild_materialized_view(definition)
+
+    @api.model
+    def _check_storage(self):
+        if self._storage not in ('view', 'table'):
+            msg = f'Unknown storage {self._storage} in {self._name}'
+            raise ValueError(msg)
+
+        if self._storage == 'table' and \
+                not (self._natural_key and self._delta_key):
+            msg = (f'Materialized view {self._name} must declare a natural '
+                   f'key and a delta key to be stored as a table')
+            raise ValueError(msg)
+
+    @api.model
+    def _get_storage_keyword(self):
+        return 'TABLE' if self._storage == 'table' else 'MATERIALIZED VIEW'
+
+    @api.model
+    def _get_definition_hash(self):
+        sentences = [self._storage, self._get_view_sql()]
+        sentences += [item[1] for item in self._get_index_sentences()]
+
+        return sha1('\n'.join(sentences).encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_stored_definition_hash(self):
+        self.env.cr.execute(self._stored_definition_sql, [self._table])
+        row = self.env.cr.fetchone()
+
+        comment = (row and row[0]) or ''
+        prefix = 'materialized_views:'
+
+        return comment[len(prefix):] if comment.startswith(prefix) else None
+
+    _stored_definition_sql = '''
+        SELECT
+            obj_description ( c.oid, 'pg_class' )
+        FROM
+            pg_class AS c
+        WHERE
+            c.oid = to_regclass ( %s )
+            AND c.relkind IN ( 'm', 'r' )
+    '''
+
+    @api.model
+    def _rebuild_materialized_view(self, definition):
+        """ Build the view under a temporary name, with its indexes, and
+        replace the current one with it.
+
+        Args:
+            definition (str): definition hash to be stored in the view
+        """
+
+        cr = self.env.cr
+
+        table = self._table
+        temporary = f'{table}__new'
+
+        with_data = not self._defer_population
+
+        _logger.info(f'Building materialized view {table}')
+
+        self._clear_delta()
+
+        self._drop_materialized_view_if_exists(temporary)
+        self._create_materialized_view(temporary, with_data=with_data)
+
+        index_names = []
+        for name, sentence in self._get_index_sentences(temporary):
+            index_names.append(name)
+            cr.execute(sentence)
+
+        keyword = self._get_storage_keyword()
+
+        dependents = self._get_dependents()
+
         self._drop_materialized_view_if_exists()
-        self._create_materialized_view()
+        cr.execute(f'ALTER {keyword} {temporary} RENAME TO {table}')
+
+        for name in index_names:
+            new_name = table + name[len(temporary):]
+            cr.execute(f'ALTER INDEX {name} RENAME TO {new_name}')
+
+        comment = f'materialized_views:{definition}'
+        cr.execute(f'COMMENT ON {keyword} {table} IS %s', [comment])
+
+        if with_data:
+            self._save_state()
+        else:
+            self._log_full_change()  # Populated by the scheduled action
+
+        self._restore_dependents(dependents)
+        self._reset_downstream_tables()
+
+    @api.model
+    def _reset_downstream_tables(self):
+        """ Views stored as tables which are built on this one track it with
+        triggers, like any other source table. The triggers are dropped
+        along with the old version, so they are created again and a full
+        refresh is logged for the rows computed from it.
+        """
+
+        if self._storage != 'table':
+            return
+
+        for name in self._get_view_models():
+            view_obj = self.env[name]
+            if self._table in view_obj._source_tables:
+                view_obj._setup_change_triggers()
+                view_obj._log_full_change()
+
+    @api.model
+    def _get_dependents(self):
+        """ Views and materialized views built, directly or not, on this
+        one. They are dropped along with it, so they have to be created
+        again after the swap.
+
+        Returns:
+            list: dictionaries with the ``name``, ``kind``, ``definition``,
+            ``comment`` and ``indexes`` of each dependent, sorted so each one
+            comes after the ones it is built from
+        """
+
+        self.env.cr.execute(self._dependents_sql, [self._table])
+
+        return self.env.cr.dictfetchall()
+
+    _dependents_sql = '''
+        WITH RECURSIVE dependents AS (
+            SELECT
+                to_regclass ( %s )::OID AS "oid",
+                0 AS "depth"
+            UNION ALL
+            SELECT DISTINCT
+                rw.ev_class,
+                dt."depth" + 1
+            FROM
+                dependents AS dt
+                INNER JOIN pg_depend AS dp
+                    ON dp.refobjid = dt."oid"
+                    AND dp.classid = 'pg_rewrite'::REGCLASS
+                INNER JOIN pg_rewrite AS rw
+                    ON rw."oid" = dp.objid AND rw.ev_class <> dt."oid"
+        )
+        SELECT
+            c."oid"::REGCLASS::TEXT AS "name",
+            c.relkind AS kind,
+            pg_get_viewdef ( c."oid" ) AS "definition",
+            obj_description ( c."oid", 'pg_class' ) AS "comment",
+            ARRAY (
+                SELECT
+                    pg_get_indexdef ( i.indexrelid )
+                FROM
+                    pg_index AS i
+                WHERE
+                    i.indrelid = c."oid"
+            ) AS indexes
+        FROM
+            (
+                SELECT
+                    "oid",
+                    MAX ( "depth" ) AS "depth"
+                FROM
+                    dependents
+                WHERE
+                    "depth" > 0
+                GROUP BY
+                    "oid"
+            ) AS dt
+            INNER JOIN pg_class AS c ON c."oid" = dt."oid"
+        ORDER BY
+            dt."depth" ASC,
+            c."oid" ASC
+    '''
+
+    @api.model
+    def _restore_dependents(self, dependents):
+        """ Create again the dependents dropped by the swap. Those managed by
+        other models are rebuilt by them, the others are created from their
+        former definition, along with their indexes and comments.
+
+        Args:
+            dependents (list): as returned by ``_get_dependents``
+        """
+
+        cr = self.env.cr
+
+        managed = {
+            self.env[name]._table: name for name in self._get_view_models()
+        }
+
+        for dependent in dependents:
+            name = dependent['name']
+
+            if name in managed:
+                view_obj = self.env[managed[name]]
+                view_obj._rebuild_materialized_view(
+                    view_obj._get_definition_hash())
+                continue
+
+            cr.execute(self._relation_kind_sql, [name])
+            if cr.fetchone():
+                continue
+
+            _logger.info(f'Restoring {name}, it depends on {self._table}')
+
+            if dependent['kind'] == 'm':
+                keyword = 'MATERIALIZED VIEW'
+            else:
+                keyword = 'VIEW'
+
+            definition = dependent['definition'].rstrip().rstrip(';')
+            cr.execute(f'CREATE {keyword} {name} AS {definition}')
+
+            for sentence in dependent['indexes'] or []:
+                cr.execute(sentence)
+
+            if dependent['comment']:
+                cr.execute(f'COMMENT ON {keyword} {name} IS %s',
+                           [dependent['comment']])
+
+    @api.model
+    def _get_id_expression(self, alias='src'):
+        """ SQL expression which computes the row id from the natural key.
+        Composite keys are hashed, only 52 bits of the hash are used so ids
+        are positive and safe for the web client.
+
+        Returns:
+            str: SQL expression or None if there is no natural key
+        """
+
+        columns = [f'{alias}."{column}"' for column in self._natural_key]
+
+        if not columns:
+            return None
+
+        if len(columns) == 1:
+            return columns[0]
+
+        row = 'ROW ( {} )::TEXT'.format(', '.join(columns))
+
+        return f"( 'x' || substr ( md5 ( {row} ), 1, 13 ) )::BIT(52)::BIGINT"
+
+    @api.model
+    def _get_view_sql(self):
+        """ Query which defines the view, the declared ``_view_sql`` with
+        the ``id`` column derived from the natural key, if any.
+
+        Returns:
+            str: SQL query
+        """
+
+        id_expression = self._get_id_expression()
+        if not id_expression:
+            return self._view_sql
+
+        return f'''
+            SELECT
+                {id_expression} AS "id",
+                src.*
+            FROM
+                ( {self._view_sql} ) AS src
+        '''
 
     @api.model
-    def _create_materialized_view(self):
-        pattern = 'CREATE MATERIALIZED VIEW IF NOT EXISTS {} as ( {} )'
-        sentence = pattern.format(self._table, self._view_sql)
+    def _create_materialized_view(self, table=None, with_data=True):
+        table = table or self._table
+        data = 'WITH DATA' if with_data else 'WITH NO DATA'
+        keyword = self._get_storage_keyword()
+
+        pattern = 'CREATE {} IF NOT EXISTS {} as ( {} ) {}'
+        sentence = pattern.format(keyword, table, self._get_view_sql(), data)
 
-        _logger.debug(f'Creating materialized view {self._table}')
+        _logger.debug(f'Creating materialized view {table}')
         self.env.cr.execute(sentence)
 
     @api.model
-    def _drop_materialized_view_if_exists(self):
-        sentence = f'DROP MATERIALIZED VIEW IF EXISTS {self._table} CASCADE;'
+    def _get_index_sentences(self, table=None):
+        """ Sentences to create the unique index and the declared secondary
+        indexes of the view
+
+        Args:
+            table (str, optional): name of the view, model table by default
+
+        Returns:
+            list: ``(index name, sentence)`` tuples
+
+        Raises:
+            ValueError: if the model does not declare a unique key
+        """
+
+        if not self._unique_key:
+            msg = f'Materialized view {self._name} must declare a unique key'
+            raise ValueError(msg)
+
+        table = table or self._table
 
-        _logger.debug(f'Dropping materialized view {self._table}')
+        indexes = [('unique_key', {'columns': self._unique_key})]
+        if self._storage == 'table':
+            indexes.append(('delta_key', {'columns': [self._delta_key]}))
+        indexes += sorted(self._indexes.items())
+
+        result = []
+        for suffix, index in indexes:
+            name = f'{table}_{suffix}_index'
+
+            unique = 'UNIQUE' if suffix == 'unique_key' else ''
+            using = index.get('using') or 'btree'
+            columns = ', '.join(f'"{column}"' for column in index['columns'])
+            where = f'WHERE {index["where"]}' if index.get('where') else ''
+
+            sentence = (f'CREATE {unique} INDEX IF NOT EXISTS {name} '
+                        f'ON {table} USING {using} ( {columns} ) {where}')
+
+            result.append((name, sentence))
+
+        return result
+
+    @api.model
+    def _is_populated(self):
+        self.env.cr.execute(self._is_populated_sql, [self._table])
+        row = self.env.cr.fetchone()
+
+        return bool(row and row[0])
+
+    _is_populated_sql = '''
+        SELECT
+            relispopulated
+        FROM
+            pg_class
+        WHERE
+            oid = to_regclass ( %s )
+    '''
+
+    @api.model
+    def _drop_materialized_view_if_exists(self, table=None):
+        """ Drop the relation with the given name, it can be a materialized
+        view, a table or a view, so the storage of a model can be changed
+
+        Args:
+            table (str, optional): relation name, model table by default
+        """
+
+        table = table or self._table
+
+        self.env.cr.execute(self._relation_kind_sql, [table])
+        row = self.env.cr.fetchone()
+
+        keywords = {'m': 'MATERIALIZED VIEW', 'r': 'TABLE', 'v': 'VIEW'}
+        keyword = keywords.get(row and row[0])
+        if not keyword:
+            return
+
+        sentence = f'DROP {keyword} IF EXISTS {table} CASCADE;'
+
+        _logger.debug(f'Dropping materialized view {table}')
         self.env.cr.execute(sentence)
 
+    _relation_kind_sql = '''
+        SELECT
+            relkind
+        FROM
+            pg_class
+        WHERE
+            oid = to_regclass ( %s )
+    '''
+
     @api.model
     def refresh_materialized_view(self, concurrently=True):
+        """ Refresh the view. Concurrent refreshes do not lock readers, they
+        use the unique index, but they can only be done on populated views,
+        so views created ``WITH NO DATA`` fall back to a plain refresh.
+
+        Args:
+            concurrently (bool, optional): refresh without locking readers
+        """
+
+        if self._storage == 'table':
+            self._refresh_table()
+            self._save_state()
+            return
+
+        # Changes committed after the refresh snapshot are logged again
+        self._clear_delta()
+
+        if concurrently and not self._is_populated():
+            concurrently = False
+
         concurrently = 'CONCURRENTLY' if concurrently else ''
         sentence = f'REFRESH MATERIALIZED VIEW {concurrently} {self._table};'
 
         _logger.debug(f'Refreshing materialized view {self._table}')
         self.env.cr.execute(sentence)
 
+        self._save_state()
+
+    @api.model
+    def _refresh_table(self):
+        """ Recompute all the rows of a view stored as a table. Pending
+        changes are discarded, they are included in the new rows.
+        """
+
+        self._clear_delta()
+
+        _logger.debug(f'Refreshing materialized view table {self._table}')
+        self.env.cr.execute(f'DELETE FROM {self._table}')
+        self.env.cr.execute(
+            f'INSERT INTO {self._table} {self._get_view_sql()}')
+
+    @api.model
+    def apply_delta(self):
+        """ Recompute only the groups of rows affected by the changes logged
+        since the last refresh. Their rows are removed and inserted again
+        using the view query restricted to the affected delta keys, so
+        groups which no longer have rows are removed as well.
+
+        Returns:
+            int: number of recomputed groups
+        """
+
+        if self._storage != 'table':
+            return 0
+
+        cr = self.env.cr
+
+        cr.execute(self._consume_delta_sql, [self._name])
+        keys = sorted({row[0] for row in cr.fetchall() if row[0] is not None})
+
+        if not keys:
+            return 0
+
+        cr.execute(self._key_type_sql, [self._table, self._delta_key])
+        key_type = cr.fetchone()[0]
+
+        table, key = self._table, self._delta_key
+        query = self._get_view_sql().replace('%', '%%')
+
+        condition = f'"{key}" = ANY ( %s::{key_type}[] )'
+
+        cr.execute(f'DELETE FROM {table} WHERE {condition}', [keys])
+        cr.execute(f'''
+            INSERT INTO {table}
+            SELECT src.* FROM ( {query} ) AS src WHERE src.{condition}
+        ''', [keys])
+
+        self._save_state()
+
+        _logger.debug(f'{len(keys)} groups of {table} recomputed')
+
+        return len(keys)
+
+    _consume_delta_sql = '''
+        DELETE FROM
+            materialized_view_delta
+        WHERE
+            "name" = %s
+            AND key_value IS NOT NULL
+        RETURNING
+            key_value
+    '''
+
+    _key_type_sql = '''
+        SELECT
+            format_type ( atttypid, atttypmod )
+        FROM
+            pg_attribute
+        WHERE
+            attrelid = to_regclass ( %s )
+            AND attname = %s
+            AND NOT attisdropped
+    '''
+
     @api.model
-    def _get_last_record_write_date(self):
-        model = self.sudo()
-        record = model.search([], order='__last_update desc', limit=1)
+    def _clear_delta(self):
+        self.env.cr.execute(
+            'DELETE FROM materialized_view_delta WHERE "name" = %s',
+            [self._name])
 
-        return record.write_date if record else None
+    @api.model
+    def _log_full_change(self):
+        """ Log a change which requires a full refresh of the view
+        """
+
+        self.env.cr.execute(self._log_full_change_sql, [self._name])
+
+    _log_full_change_sql = '''
+        INSERT INTO materialized_view_delta ( "name", key_value )
+        VALUES ( %s, NULL )
+    '''
+
+    @api.model
+    def _has_full_change(self):
+        self.env.cr.execute(self._has_full_change_sql, [self._name])
+
+        return bool(self.env.cr.fetchone())
+
+    _has_full_change_sql = '''
+        SELECT
+            1
+        FROM
+            materialized_view_delta
+        WHERE
+            "name" = %s
+            AND key_value IS NULL
+        LIMIT 1
+    '''
 
     @api.model
-    def _get_last_cron_execution_time(self):
-        cron_task_xid = 'materialized_views.ir_cron_refresh_materialized_views'
-        cron_task = self.env.ref(cron_task_xid, False)
+    def _setup_change_triggers(self):
+        """ Create the triggers which log the changes of the source tables,
+        previous ones are removed so sources can be changed.
+
+        Changes in the delta sources of views stored as tables are logged
+        row by row with their delta key. Changes in the other sources are
+        logged once per statement, without key, and lead to a full refresh.
+        Updates are only logged when they set some of the columns declared
+        in ``_source_columns``. Source views cannot have triggers, they are
+        tracked by their refresh date.
+        """
+
+        cr = self.env.cr
+        trigger = f'{self._table}_changes'
+
+        names = [trigger, f'{self._table}_delta']
+        cr.execute(self._change_triggers_sql, [names])
+        for name, source in cr.fetchall():
+            cr.execute(f'DROP TRIGGER IF EXISTS {name} ON {source}')
+
+        delta_sources = {}
+        if self._storage == 'table':
+            delta_sources = self._delta_sources
+
+        sources = set(self._source_tables) | set(delta_sources)
+        for source in sorted(sources):
+            cr.execute(self._relation_kind_sql, [source])
+            row = cr.fetchone()
+            if not row or row[0] != 'r':
+                continue
 
-        # Si el cron existe, devuelve la última hora de ejecución
-        if cron_task:
-            return cron_task.lastcall
+            key = delta_sources.get(source) or ''
+            level = 'ROW' if key else 'STATEMENT'
+
+            columns = self._source_columns.get(source)
+            if columns:
+                columns = ', '.join(f'"{column}"' for column in columns)
+                update = f'UPDATE OF {columns}'
+            else:
+                update = 'UPDATE'
+
+            cr.execute(f'''
+                CREATE TRIGGER {trigger}
+                AFTER INSERT OR DELETE OR {update} ON {source}
+                FOR EACH {level} EXECUTE PROCEDURE
+                materialized_view_delta_log ( '{self._name}', '{key}' )
+            ''')
+
+    _change_triggers_sql = '''
+        SELECT
+            tgname::TEXT,
+            tgrelid::REGCLASS::TEXT
+        FROM
+            pg_trigger
+        WHERE
+            tgname = ANY ( %s::VARCHAR[] )
+    '''
+
+    @api.model
+    def refresh_changes(self):
+        """ Bring the view up to date after a change in its sources, tables
+        are updated from the logged changes and views are refreshed
+        """
+
+        if self._storage == 'table':
+            self.apply_delta()
         else:
-            return datetime.min
+            self.refresh_materialized_view()
 
     @api.model
-    def cron_task(self):
-        target_type = type(self)
+    def _save_state(self):
+        state = self.env['materialized.view.state'].sudo().get_state(
+            self._name)
+        state.write({'refresh_date': fields.Datetime.now()})
+
+    @api.model
+    def schedule_refresh(self):
+        """ Apply the logged changes to the table once the current
+        transaction has been committed. Several calls in the same transaction
+        lead to a single refresh, and nothing is done if the transaction is
+        rolled back.
+
+        The refresh takes place in a new cursor, so readers are not blocked
+        and the table will not include changes that have not been committed.
+        Views stored as materialized views are left to the scheduled action,
+        refreshing them after each transaction would cost as much as building
+        the whole view on every write.
+        """
+
+        if self._storage != 'table':
+            return
+
+        cr = self.env.cr
+
+        pending = _pending_refreshes.get(cr)
+        if pending is None:
+            pending = _pending_refreshes[cr] = set()
+
+            dbname = cr.dbname
+            registry = self.pool
+
+            def refresh():
+                names = _pending_refreshes.pop(cr, set())
+                self._refresh_pending_views(registry, dbname, names)
+
+            def discard():
+                _pending_refreshes.pop(cr, None)
+
+            cr.after('commit', refresh)
+            cr.after('rollback', discard)
+
+        pending.add(self._name)
+
+    @staticmethod
+    def _refresh_pending_views(registry, dbname, names):
+        """ Bring the given views up to date, along with the views stored as
+        tables which are built on them, each one after its sources
+        """
+
+        with api.Environment.manage(), registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            view_obj = env['materialized.view.abstract']
+
+            ordered = []
+            for name in view_obj._get_view_models():
+                downstream = env[name]._storage == 'table' and any(
+                    upstream in ordered
+                    for upstream in env[name]._get_upstream_models())
+                if name in names or downstream:
+                    ordered.append(name)
+
+        for name in ordered:
+            try:
+                with api.Environment.manage(), registry.cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    env[name].refresh_changes()
+            except Exception as ex:
+                _logger.warning(f'Materialized view of {name} could not be '
+                                f'refreshed in {dbname}: {ex}')
+
+    @api.model
+    def _get_view_models(self):
+        """ Names of the models built on materialized views, sorted so each
+        view comes after the views it is built from.
+
+        Returns:
+            list: model names
+        """
 
-        _logger.info(f'The materialized view update process has started')
+        names = [
+            name for name in self.pool.descendants([self._name], '_inherit')
+            if not self.env[name]._abstract
+        ]
 
-        lastcall = self._get_last_cron_execution_time()
+        by_table = {self.env[name]._table: name for name in names}
 
-        for model_name, model_obj in self.env.items():
-            if not isinstance(model_obj, target_type):
+        result, visiting = [], set()
+
+        def visit(name):
+            if name in result or name in visiting:
+                return
+
+            visiting.add(name)
+            for table in self.env[name]._source_tables:
+                if table in by_table:
+                    visit(by_table[table])
+            visiting.discard(name)
+
+            result.append(name)
+
+        for name in sorted(names):
+            visit(name)
+
+        return result
+
+    @api.model
+    def _get_upstream_models(self):
+        """ Names of the models whose views this one is built from
+        """
+
+        names = self._get_view_models()
+        tables = set(self._source_tables)
+
+        return [name for name in names if self.env[name]._table in tables]
+
+    @api.model
+    def _is_stale(self, refreshed=None):
+        """ Check if the view has to be refreshed, that is, if the triggers
+        of its source tables have logged a change which cannot be applied as
+        a delta or if some of the materialized views it is built from has
+        been refreshed after it. The log is transactional, unlike the table
+        statistics, so it neither lags behind the changes nor gets reset.
+        Views stored as tables are tracked by triggers as any other table.
+
+        Args:
+            refreshed (set, optional): models refreshed in the current run
+
+        Returns:
+            bool: True if the view has to be refreshed
+        """
+
+        if not self._source_tables or not self._is_populated():
+            return True
+
+        state_obj = self.env['materialized.view.state'].sudo()
+        state = state_obj.get_state(self._name)
+
+        if not state.refresh_date:
+            return True
+
+        if self._has_full_change():
+            return True
+
+        for name in self._get_upstream_models():
+            if self.env[name]._storage == 'table':
                 continue
 
-            last_update = model_obj._get_last_record_write_date()
-            if last_update and last_update < lastcall:
-                model_obj.refresh_materialized_view()
+            if refreshed and name in refreshed:
+                return True
+
+            upstream = state_obj.get_state(name)
+            if upstream.refresh_date and \
+                    upstream.refresh_date > state.refresh_date:
+                return True
+
+        return False
+
+    @api.model
+    def cron_task(self):
+        """ Refresh, in dependency order, only the stale views. Views stored
+        as tables which are not stale apply their pending changes.
+        """
+
+        _logger.info('The materialized view update process has started')
+
+        refreshed = set()
+
+        names = self._get_view_models()
+        for name in names:
+            view_obj = self.env[name]
+            if view_obj._is_stale(refreshed):
+                view_obj.refresh_materialized_view()
+                refreshed.add(name)
+            elif view_obj.apply_delta():
+                refreshed.add(name)
 
-        _logger.info(f'The materialized view update process has finished')
+        msg = 'The materialized view update process has finished: {} of {} ' \
+              'views refreshed'
+        _logger.info(msg.format(len(refreshed), len(names)))
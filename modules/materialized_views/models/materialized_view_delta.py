@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import models, fields
+
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+class MaterializedViewDelta(models.Model):
+    """ Change log of the materialized view models. Source table triggers
+    add a row with the key of each affected group, the rows are consumed
+    when the groups are recomputed. Rows without key mean the whole view
+    has to be refreshed.
+    """
+
+    _name = 'materialized.view.delta'
+    _description = u'Materialized view delta'
+
+    _rec_name = 'name'
+    _order = 'id ASC'
+
+    _log_access = False
+
+    name = fields.Char(
+        string='Model',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Technical name of the materialized view model',
+        size=255,
+        translate=False
+    )
+
+    key_value = fields.Char(
+        string='Key',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Value of the delta key of the affected group, as text',
+        translate=False
+    )
+
+    def init(self):
+        self.env.cr.execute(self._log_function_sql)
+
+    # Generic trigger function, arguments are the name of the model and the
+    # source table column which holds the value of the delta key, an empty
+    # one logs a single row without key
+    _log_function_sql = '''
+        CREATE OR REPLACE FUNCTION materialized_view_delta_log()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            old_key TEXT;
+            new_key TEXT;
+        BEGIN
+            IF TG_LEVEL = 'STATEMENT' OR COALESCE ( TG_ARGV[1], '' ) = '' THEN
+                INSERT INTO materialized_view_delta ( "name", key_value )
+                SELECT
+                    TG_ARGV[0], NULL
+                WHERE
+                    NOT EXISTS (
+                        SELECT
+                            1
+                        FROM
+                            materialized_view_delta
+                        WHERE
+                            "name" = TG_ARGV[0]
+                            AND key_value IS NULL
+                    );
+
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP <> 'INSERT' THEN
+                old_key := to_jsonb ( OLD ) ->> TG_ARGV[1];
+
+                INSERT INTO materialized_view_delta ( "name", key_value )
+                VALUES ( TG_ARGV[0], old_key );
+            END IF;
+
+            IF TG_OP <> 'DELETE' THEN
+                new_key := to_jsonb ( NEW ) ->> TG_ARGV[1];
+
+                IF TG_OP = 'INSERT' OR new_key IS DISTINCT FROM old_key THEN
+                    INSERT INTO materialized_view_delta ( "name", key_value )
+                    VALUES ( TG_ARGV[0], new_key );
+                END IF;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    '''
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#    License, author and contributors information in:                         #
+#    __openerp__.py file at the root folder of this module.                   #
+###############################################################################
+
+from odoo import models, fields, api
+from odoo.tools.translate import _
+
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+class MaterializedViewState(models.Model):
+    """ Last refresh of each materialized view model. It is used to refresh
+    the views built from other views after them.
+    """
+
+    _name = 'materialized.view.state'
+    _description = u'Materialized view state'
+
+    _rec_name = 'name'
+    _order = 'name ASC'
+
+    name = fields.Char(
+        string='Model',
+        required=True,
+        readonly=True,
+        index=True,
+        default=None,
+        help='Technical name of the materialized view model',
+        size=255,
+        translate=False
+    )
+
+    refresh_date = fields.Datetime(
+        string='Last refresh',
+        required=False,
+        readonly=True,
+        index=False,
+        default=None,
+        help='Date/time on which the view was refreshed for the last time'
+    )
+
+    _sql_constraints = [
+        (
+            'unique_name',
+            'UNIQUE(name)',
+            _('There is already a state for this model')
+        )
+    ]
+
+    @api.model
+    def get_state(self, model_name):
+        """ Get the state of the given model, it will be created if it does
+        not exist
+
+        Args:
+            model_name (str): materialized view model name
+
+        Returns:
+            models.Model: materialized.view.state record
+        """
+
+        state = self.search([('name', '=', model_name)], limit=1)
+        if not state:
+            state = self.create({'name': model_name})
+
+        return state
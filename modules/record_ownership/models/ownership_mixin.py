@@ -2,6 +2,7 @@
 """ OwnershipMixin
 """
 
+from collections import defaultdict
 from logging import getLogger
 from odoo import models, fields, api
 
@@ -245,33 +246,51 @@ class OwnershipMixin(models.AbstractModel):
 
     def _ensure_managers_as_followers(self, values):
         """ Suscribes given user to all the records in given recordset.
-            This method check if ``message_subscribe`` method exists
+            This method check if ``message_subscribe`` method exists.
+
+            Records are grouped by partner, so each partner is subscribed
+            to all its records in a single call.
         """
 
         if 'mail.thread' in self._inherit:
 
-            for record in self:
-                subscribe = getattr(record.sudo(), 'message_subscribe')
+            followers = defaultdict(list)
 
+            for record in self:
                 if 'owner_id' in values.keys() and record.owner_id:
-                    subscribe([record.owner_id.partner_id.id])
+                    partner_id = record.owner_id.partner_id.id
+                    followers[partner_id].append(record.id)
 
                 if 'subrogate_id' in values.keys() and record.subrogate_id:
-                    subscribe([record.subrogate_id.partner_id.id])
+                    partner_id = record.subrogate_id.partner_id.id
+                    followers[partner_id].append(record.id)
 
-    @api.model
-    def create(self, values):
+            for partner_id, record_ids in followers.items():
+                record_set = self.browse(record_ids).sudo()
+                subscribe = getattr(record_set, 'message_subscribe')
+                subscribe([partner_id])
+
+    @api.model_create_multi
+    def create(self, values_list):
         """ Prevent unauthorized users from changing ownership for others other
         than themselves.
 
         Appends owner to mail.followers list.
         """
 
-        self._pick_owner(values)
+        for values in values_list:
+            self._pick_owner(values)
 
-        result = super(OwnershipMixin, self).create(values)
+        result = super(OwnershipMixin, self).create(values_list)
 
-        result._ensure_managers_as_followers(values)
+        for field_name in ['owner_id', 'subrogate_id']:
+            record_ids = [
+                record.id for record, values in zip(result, values_list)
+                if field_name in values.keys()
+            ]
+            if record_ids:
+                record_set = result.browse(record_ids)
+                record_set._ensure_managers_as_followers({field_name: True})
 
         return result
 
@@ -5,6 +5,8 @@
 ###############################################################################
 
 from odoo import models, fields, api
+from odoo.tools.translate import _
+from odoo.exceptions import UserError
 from logging import getLogger
 from odoo.osv.expression import TERM_OPERATORS_NEGATION
 from odoo.osv.expression import TRUE_DOMAIN, FALSE_DOMAIN
@@ -13,6 +15,17 @@ from odoo.osv.expression import TRUE_DOMAIN, FALSE_DOMAIN
 _logger = getLogger(__name__)
 
 
+COUNT_OPERATORS = {
+    '=': '= %s',
+    '!=': '<> %s',
+    '<>': '<> %s',
+    '<': '< %s',
+    '<=': '<= %s',
+    '>': '> %s',
+    '>=': '>= %s'
+}
+
+
 class IrExports(models.Model):
     """ Allow to view and export ir.exports records
     """
@@ -38,16 +51,10 @@ class IrExports(models.Model):
 
     @api.model
     def _search_export_fields_count(self, operator, value):
-        sql = '''
-            SELECT
-                ie."id" AS export_id
-            FROM
-                ir_exports AS ie
-                LEFT JOIN ir_exports_line AS iel ON iel.export_id = ie."id"
-            GROUP BY
-                ie."id"
-            HAVING COUNT ( iel."id" )::INTEGER {op} {value}
-        '''
+        """ Search exports by number of fields using a subquery domain, the
+        operator must be in the whitelist and the value is passed as a bound
+        parameter.
+        """
 
         if isinstance(value, bool):
             if value is False:
@@ -60,10 +67,23 @@ class IrExports(models.Model):
                 domain = FALSE_DOMAIN
 
         else:
-            cursor = self.env.cr
-            cursor.execute(sql.format(op=operator, value=value))
-            rows = cursor.dictfetchall()
-            ids = [v for k, v in rows.items()]
-            domain = [('id', 'in', ids)]
+            comparison = COUNT_OPERATORS.get(operator)
+            if not comparison:
+                raise UserError(_('Operator not implemented: %s') % operator)
+
+            sql = self._search_export_fields_count_sql.format(
+                comparison=comparison)
+            domain = [('id', 'inselect', (sql, [value]))]
 
         return domain
+
+    _search_export_fields_count_sql = '''
+        SELECT
+            ie."id" AS export_id
+        FROM
+            ir_exports AS ie
+            LEFT JOIN ir_exports_line AS iel ON iel.export_id = ie."id"
+        GROUP BY
+            ie."id"
+        HAVING COUNT ( iel."id" )::INTEGER {comparison}
+    '''